@@ -0,0 +1,56 @@
+# SDM Project 2. Knowledge Graphs
+# Benchmark: file size, load time and pattern lookups of the binary
+# HDT-style ABOX against parsing the Turtle one. Build both first
+# (python main.py; python main.py --format hdt), then run from the
+# repository root: python -m benchmarks.hdt
+from rdflib import Graph, Namespace
+from generators.HDTFile import HDTFile
+import argparse
+import os.path as op
+import time
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def parse_turtle(path):
+    g = Graph()
+    g.parse(path)
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='output')
+    parser.add_argument('--baseURL', default='https://SDM.org/Lab2')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    ttl_path = op.join(args.output, 'ABOX.ttl')
+    hdt_path = op.join(args.output, 'ABOX.hdt')
+    n = Namespace(args.baseURL)
+    # Subject, predicate-object and subject-predicate lookups
+    patterns = {'paper0 ?p ?o': (n.paper0, None, None),
+                '?s relates_to keyword0': (None, n.relates_to, n.keyword0),
+                'paper0 cites ?o': (n.paper0, n.cites, None)}
+
+    g, ttl_load = timed(lambda: parse_turtle(ttl_path))
+    hdt, hdt_load = timed(lambda: HDTFile(hdt_path))
+    print(f'{"":>24} {"Turtle":>12} {"HDT":>12}')
+    print(f'{"file size (MB)":>24} {op.getsize(ttl_path) / 1e6:>12.2f} {op.getsize(hdt_path) / 1e6:>12.2f}')
+    print(f'{"load (ms)":>24} {ttl_load * 1000:>12.1f} {hdt_load * 1000:>12.1f}')
+    for name, pattern in patterns.items():
+        ttl_time = min(timed(lambda: list(g.triples(pattern)))[1] for _ in range(args.repeat))
+        hdt_time = min(timed(lambda: list(hdt.triples(pattern)))[1] for _ in range(args.repeat))
+        print(f'{name + " (ms)":>24} {ttl_time * 1000:>12.3f} {hdt_time * 1000:>12.3f}')
+    _, ttl_scan = timed(lambda: sum(1 for _ in g))
+    _, hdt_scan = timed(lambda: sum(1 for _ in hdt.triples()))
+    print(f'{"all triples (ms)":>24} {ttl_scan * 1000:>12.1f} {hdt_scan * 1000:>12.1f}')
+    hdt.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# SDM Project 2. Knowledge Graphs
+# Benchmark: load/reopen time and query latency of the persistent SQLite
+# store against parsing output/TBOX.ttl + output/ABOX.ttl into memory.
+# Build both first (python main.py; python main.py --format store), then
+# run from the repository root: python -m benchmarks.store
+from rdflib import Graph
+from generators.SQLiteStore import SQLiteStore
+import argparse
+import os.path as op
+import time
+
+QUERIES = {
+    'papers of an author': '''
+        SELECT ?paper WHERE {
+            ?author :name_author "Daniel Genkin" .
+            ?author :is_corresponding_author ?paper }''',
+    'reviews of a paper': '''
+        SELECT ?review ?approves WHERE {
+            ?review :about :paper0 ; :approves ?approves }''',
+    'most cited papers': '''
+        SELECT ?paper (COUNT(?citing) AS ?citations) WHERE {
+            ?citing :cites ?paper }
+        GROUP BY ?paper ORDER BY DESC(?citations) LIMIT 5''',
+}
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run(label, open_graph, repeat):
+    g, load_time = timed(open_graph)
+    print(f'{label}: opened {len(g)} triples in {load_time * 1000:.1f} ms')
+    for name, query in QUERIES.items():
+        _, first = timed(lambda: list(g.query(query)))
+        times = [timed(lambda: list(g.query(query)))[1] for _ in range(repeat)]
+        print(f'  {name:>20}: first {first * 1000:.1f} ms, '
+              f'then {min(times) * 1000:.1f} ms')
+    g.close()
+
+
+def parse_turtle(output_dir):
+    g = Graph()
+    g.parse(op.join(output_dir, 'TBOX.ttl'))
+    g.parse(op.join(output_dir, 'ABOX.ttl'))
+    return g
+
+
+def open_store(output_dir):
+    g = Graph(SQLiteStore())
+    g.open(op.join(output_dir, 'KG.sqlite'))
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='output')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    run('Turtle', lambda: parse_turtle(args.output), args.repeat)
+    run('SQLite store', lambda: open_store(args.output), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
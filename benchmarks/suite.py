@@ -0,0 +1,104 @@
+# SDM Project 2. Knowledge Graphs
+# Benchmark suite: per-stage time, triples and memory of TBOX and ABOX builds
+# on synthetic data at several scales. Run from the repository root:
+# python -m benchmarks.suite --scales 1 10 100 --format nt
+from generators.TBOXGenerator import TBOXGenerator
+from generators.ABOXGenerator import ABOXGenerator
+from generators.Instrumentation import Instrumentation
+from benchmarks.synthetic import generate
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import argparse
+import io
+import json
+import os
+import os.path as op
+import platform
+import resource
+import tempfile
+import time
+
+ABOX_FILES = {'turtle': 'ABOX.ttl', 'fast-turtle': 'ABOX.ttl', 'nt': 'ABOX.nt',
+              'nquads': 'ABOX.nq', 'hdt': 'ABOX.hdt'}
+
+
+def run_scale(scale, format, seed, skew, trace):
+    # One build at one scale, in a scratch directory, returns its results.
+    # The generators' own instrumentation measures every stage
+    records = []
+
+    def keep(record):
+        if record['event'] == 'end':
+            records.append(record)
+
+    instrument = Instrumentation(keep, trace=trace)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        with instrument.stage('benchmark', 'synthetic_data'):
+            rows = generate(op.join(scratch, 'data'), scale, seed, skew)
+        os.makedirs(op.join(scratch, 'output'))
+        os.chdir(scratch)
+        try:
+            abox_path = op.join(scratch, 'output', ABOX_FILES[format])
+            # The generators' progress messages are not part of the results
+            with redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                TBOXGenerator('https://SDM.org/Lab2', op.join(scratch, 'output', 'TBOX.ttl'),
+                              instrument=instrument)
+                generator = ABOXGenerator('https://SDM.org/Lab2', abox_path, format=format,
+                                          cache_path=None, instrument=instrument)
+                total = time.perf_counter() - start
+            if format in ('nt', 'nquads'):
+                with open(abox_path, 'rb') as file:
+                    triples = sum(1 for _ in file)
+            else:
+                triples = len(generator.table)
+            size = op.getsize(abox_path)
+        finally:
+            os.chdir(cwd)
+    # ru_maxrss is in KB on Linux
+    return {'scale': scale, 'rows': rows, 'triples': triples, 'abox_bytes': size,
+            'seconds': total, 'triples_per_second': triples / total,
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'stages': records}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--format', choices=ABOX_FILES, default='nt')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='Zipf exponent of citation and authorship popularity')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='also record the peak traced allocation of every stage (slower)')
+    parser.add_argument('--output', default=op.join('output', 'benchmark.json'))
+    args = parser.parse_args()
+
+    results = {'format': args.format, 'seed': args.seed, 'skew': args.skew,
+               'python': platform.python_version(), 'machine': platform.machine(),
+               'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'runs': []}
+    for scale in args.scales:
+        # A fresh process per scale, so peak RSS is its own
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            run = pool.submit(run_scale, scale, args.format, args.seed, args.skew,
+                              args.tracemalloc).result()
+        results['runs'].append(run)
+        print(f'Scale {scale:g}x: {run["triples"]} triples in {run["seconds"]:.2f}s '
+              f'({run["triples_per_second"]:,.0f} triples/s), '
+              f'peak RSS {run["peak_rss"] / 1e6:.0f} MB')
+        for record in run['stages']:
+            delta = record['rss_delta']
+            print(f'  {record["component"]:>9} {record["stage"]:>19}: {record["seconds"] * 1000:>10.1f} ms, '
+                  f'{record["triples"]:>9} triples'
+                  + (f', RSS {delta / 1e6:+.1f} MB' if delta is not None else ''))
+
+    os.makedirs(op.dirname(op.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
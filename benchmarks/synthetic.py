@@ -0,0 +1,170 @@
+# SDM Project 2. Knowledge Graphs
+# Synthetic input data: every Node_*.csv and Edge_*.csv of data/, with the
+# same columns, at a scale factor of the bundled sample (scale 1 has as many
+# papers, authors, venues, ... as data/). Citations and authorship follow a
+# Zipf-like popularity, so a few papers and authors get most of the edges.
+# Run from the repository root:
+# python -m benchmarks.synthetic --scale 10 --output /tmp/sdm10
+from pandas import DataFrame
+import numpy as np
+import argparse
+import csv
+import os
+import os.path as op
+
+# Node counts of the bundled sample, at scale 1. Keywords and communities
+# are a fixed vocabulary and do not scale
+BASE = {'paper': 2000, 'author': 2915, 'affiliation': 100, 'journal': 20,
+        'conference': 20, 'volume': 814, 'edition': 30}
+KEYWORDS = ['NLP', 'data management', 'indexing', 'data modeling', 'big data',
+            'data processing', 'data storage', 'data querying', 'AI', 'ML',
+            'graphs', 'sports', 'music', 'art']
+COMMUNITIES = ['Database', 'Maths', 'Art', 'Artificial Inteligence',
+               'Programming', 'Sports', 'Music']
+WORDS = np.array('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+                 'eiusmod tempor incididunt ut labore et dolore magna aliqua'.split())
+# Mean citations per paper, authors per paper and reviews per paper
+CITES, AUTHORS, REVIEWS = 3, 2.3, 3
+KEYWORDS_PER_PAPER = 3
+
+
+def popularity(rng, n, skew):
+    # Zipf-like weights over n items in random order: the k-th most popular
+    # item is drawn with probability proportional to 1 / k^skew
+    weights = 1 / np.arange(1, n + 1) ** skew
+    return rng.permutation(weights / weights.sum())
+
+
+def sentences(rng, n, words):
+    # n strings of words random lorem ipsum words
+    picked = WORDS[rng.integers(0, len(WORDS), size=(n, words))]
+    return [' '.join(row).capitalize() + '.' for row in picked]
+
+
+def generate(path, scale=1, seed=0, skew=1.0):
+    # Writes path/nodes and path/edges, returns the rows per CSV
+    rng = np.random.default_rng(seed)
+    counts = {node: max(1, round(count * scale)) for node, count in BASE.items()}
+    n_papers = counts['paper']
+    paper_ids = np.arange(1, n_papers + 1)
+    # A few non-ASCII names, as in the sample, exercise URN escaping
+    authors = np.array([f'Author {i}' if i % 50 else f'Autor {i} Grünewälder'
+                        for i in range(counts['author'])])
+    affiliations = np.array([f'Affiliation {i}' for i in range(counts['affiliation'])])
+    journals = np.array([f'Journal {i}' for i in range(counts['journal'])])
+    conferences = np.array([f'Conference {i}' for i in range(counts['conference'])])
+    volumes = np.array([f'Volume {i} of {journals[i % len(journals)]}' for i in range(counts['volume'])])
+    editions = np.array([f'conf/{i % len(conferences)}/{1970 + i // len(conferences)}'
+                         for i in range(counts['edition'])])
+
+    tables = {}
+    tables['nodes/Node_paper.csv'] = DataFrame({
+        'id_paper': paper_ids,
+        'paper_title': sentences(rng, n_papers, 6),
+        'doi': [f'https://doi.org/10.0000/{i}' for i in paper_ids],
+        'abstract': sentences(rng, n_papers, 60),
+        'pages': np.where(rng.random(n_papers) < 0.8, rng.integers(1, 40, n_papers), -1),
+    })
+    tables['nodes/Node_author.csv'] = DataFrame({'author': authors})
+    tables['nodes/Node_affiliation.csv'] = DataFrame({
+        'Type': rng.choice(['university', 'company'], len(affiliations)), 'Affiliation': affiliations})
+    tables['nodes/Node_keywords.csv'] = DataFrame({'Node_keywords': KEYWORDS})
+    tables['nodes/Node_journals.csv'] = DataFrame({'x': journals})
+    tables['nodes/Node_conference.csv'] = DataFrame({'conference': conferences})
+    tables['nodes/Node_volumes.csv'] = DataFrame({
+        'volume': volumes, 'year': rng.integers(1970, 2024, len(volumes))})
+    tables['nodes/Node_edition.csv'] = DataFrame({
+        'ref_edition': editions, 'edition': [f'Proceedings of {e}' for e in editions],
+        'edition_num': np.arange(1, len(editions) + 1),
+        'location': rng.choice(['Barcelona, Spain', 'Paris, France', 'Berlin, Germany'], len(editions)),
+        'year': [int(e.rsplit('/', 1)[1]) for e in editions]})
+    tables['nodes/Node_community.csv'] = DataFrame({'community': COMMUNITIES})
+
+    # Authorship: every paper has at least one author, its first one is the
+    # main author. Prolific authors write most papers
+    n_authors = 1 + rng.poisson(AUTHORS - 1, n_papers)
+    writes_papers = np.repeat(paper_ids, n_authors)
+    writes_authors = authors[rng.choice(len(authors), len(writes_papers), p=popularity(rng, len(authors), skew))]
+    first = np.diff(writes_papers, prepend=0) != 0
+    writes = DataFrame({'id_paper': writes_papers, 'author': writes_authors, 'main_author': first})
+    tables['edges/Edge_papers_author.csv'] = writes.drop_duplicates(['id_paper', 'author'])
+
+    # Citations: out-degree is geometric, in-degree follows popularity
+    n_cites = rng.geometric(1 / (CITES + 1), n_papers) - 1
+    citing = np.repeat(paper_ids, n_cites)
+    cited = paper_ids[rng.choice(n_papers, len(citing), p=popularity(rng, n_papers, skew))]
+    cites = DataFrame({'id_paper': citing, 'cites_value': cited.astype(str)})
+    tables['edges/Edge_paper_paper.csv'] = cites[citing != cited].drop_duplicates()
+
+    # Reviews by authors, approving four times out of five
+    review_papers = np.repeat(paper_ids, REVIEWS)
+    tables['edges/Edge_paper_author_reviews.csv'] = DataFrame({
+        'id_paper': review_papers,
+        'author': authors[rng.integers(0, len(authors), len(review_papers))],
+        'content': sentences(rng, len(review_papers), 30),
+        'approves': rng.random(len(review_papers)) < 0.8,
+    }).drop_duplicates(['id_paper', 'author'])
+
+    tables['edges/Edge_affiliation_author.csv'] = DataFrame({
+        'author': authors, 'Affiliation': affiliations[rng.integers(0, len(affiliations), len(authors))]})
+    keyword_papers = np.repeat(paper_ids, KEYWORDS_PER_PAPER)
+    tables['edges/Edge_paper_keywords.csv'] = DataFrame({
+        'id_paper': keyword_papers,
+        'keywords': np.array(KEYWORDS)[rng.integers(0, len(KEYWORDS), len(keyword_papers))],
+    }).drop_duplicates()
+    tables['edges/Edge_community_keyword.csv'] = DataFrame({
+        'community': [COMMUNITIES[i % len(COMMUNITIES)] for i in range(len(KEYWORDS))],
+        'keywords': KEYWORDS})
+
+    # Half of the papers appear in journal volumes, the others in editions
+    # of conferences
+    in_journal = rng.random(n_papers) < 0.5
+    journal_papers, conference_papers = paper_ids[in_journal], paper_ids[~in_journal]
+    paper_volumes = volumes[rng.integers(0, len(volumes), len(journal_papers))]
+    tables['edges/Edge_paper_volumes.csv'] = DataFrame({
+        'id_paper': journal_papers, 'id_volume': paper_volumes,
+        'volume': [volume.split(' of ')[0] for volume in paper_volumes]})
+    tables['edges/Edge_volumes_journal.csv'] = DataFrame({
+        'id_volume': volumes, 'journal': [journals[i % len(journals)] for i in range(len(volumes))]})
+    tables['edges/Edge_paper_journal.csv'] = DataFrame({
+        'id_paper': journal_papers,
+        'journal': [volume.split(' of ')[1] for volume in paper_volumes]})
+    tables['edges/Edge_papers_edition.csv'] = DataFrame({
+        'id_paper': conference_papers,
+        'ref_edition': editions[rng.integers(0, len(editions), len(conference_papers))]})
+    tables['edges/Edge_edition_conference.csv'] = DataFrame({
+        'ref_edition': editions, 'conference': [conferences[int(e.split('/')[1])] for e in editions]})
+    tables['edges/Edge_conference_community.csv'] = DataFrame({
+        'conference': conferences, 'community': rng.choice(COMMUNITIES, len(conferences))})
+    tables['edges/Edge_journal_community.csv'] = DataFrame({
+        'journal': journals, 'community': rng.choice(COMMUNITIES, len(journals))})
+
+    for directory in ('nodes', 'edges'):
+        os.makedirs(op.join(path, directory), exist_ok=True)
+    for name, df in tables.items():
+        # Quoted strings, TRUE/FALSE booleans and NA for missing numbers,
+        # as in the sample
+        for column in df.columns[df.dtypes == bool]:
+            df = df.assign(**{column: np.where(df[column], 'TRUE', 'FALSE')})
+        if 'pages' in df:
+            df = df.assign(pages=df['pages'].astype(object).where(df['pages'] >= 0, 'NA'))
+        df.to_csv(op.join(path, name), index=False, quoting=csv.QUOTE_NONNUMERIC)
+    return {op.basename(name): len(df) for name, df in tables.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='Zipf exponent of citation and authorship popularity')
+    parser.add_argument('--output', required=True,
+                        help='directory to write nodes/ and edges/ to')
+    args = parser.parse_args()
+    rows = generate(args.output, args.scale, args.seed, args.skew)
+    for name, count in rows.items():
+        print(f'{name:>32}: {count} rows')
+
+
+if __name__ == '__main__':
+    main()
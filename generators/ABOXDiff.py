@@ -0,0 +1,161 @@
+# SDM Project 2. Knowledge Graphs
+# Changeset between two ABOX builds. Every build is reduced to a sorted,
+# duplicate-free N-Triples snapshot with an external merge sort, so memory is
+# bounded by the run size whatever the size of the ABOX, and the previous
+# snapshot is compared with the new one in a single merge pass. The added and
+# removed triples are written as SPARQL Update or RDF Patch
+from generators.TripleTable import TripleTable
+from generators.RDFSMaterializer import load
+from generators.NTriples import split_line
+from generators.BuildManifest import file_hash
+import gzip
+import heapq
+import os
+import os.path as op
+import tempfile
+import uuid
+
+PATCH_FORMATS = {'sparql': '.ru', 'rdf-patch': '.rdfp'}
+# Triples per INSERT DATA / DELETE DATA request
+BATCH = 10000
+
+
+class ABOXDiff():
+
+    def __init__(self, abox_path, output_dir, format='sparql', run_size=1000000):
+        print('Computing ABOX changeset...')
+        self.run_size = run_size
+        snapshot_path = op.join(output_dir, 'ABOX.snapshot.nt')
+        new_path = snapshot_path + '.new'
+        self.added_path = op.join(output_dir, 'ABOX.added.nt')
+        self.removed_path = op.join(output_dir, 'ABOX.removed.nt')
+        patch_path = op.join(output_dir, 'ABOX.patch' + PATCH_FORMATS[format])
+
+        self.sort(ntriples_lines(abox_path), new_path)
+        if not op.exists(snapshot_path):
+            # No previous build: everything is added
+            open(snapshot_path, 'w').close()
+            print('No previous ABOX snapshot, the changeset adds the whole ABOX')
+        added, removed = self.compare(snapshot_path, new_path)
+
+        if not added and not removed:
+            # Nothing to apply: no patch, and none left from an earlier build
+            # (an RDF Patch would have id == prev)
+            os.remove(new_path)
+            if op.exists(patch_path):
+                os.remove(patch_path)
+            print('ABOX unchanged since the previous build, no patch written')
+            return
+        previous, current = snapshot_id(snapshot_path), snapshot_id(new_path)
+        if format == 'sparql':
+            self.write_sparql(patch_path)
+        else:
+            self.write_rdf_patch(patch_path, previous, current)
+        # The new snapshot is the baseline of the next build
+        os.replace(new_path, snapshot_path)
+        print(f'ABOX changeset: {added} added, {removed} removed triple(s), '
+              f'see {op.basename(patch_path)}')
+
+    ########### External sort ###########
+    def sort(self, lines, path):
+        # Sorted runs of run_size lines are spilled to disk and merged,
+        # dropping duplicates
+        with tempfile.TemporaryDirectory(dir=op.dirname(path)) as run_dir:
+            runs = []
+            while True:
+                run = sorted(line for _, line in zip(range(self.run_size), lines))
+                if not run:
+                    break
+                runs.append(op.join(run_dir, f'run{len(runs)}.nt'))
+                with open(runs[-1], 'w', encoding='utf-8', newline='\n') as file:
+                    file.writelines(run)
+            files = [open(run, encoding='utf-8', newline='\n') for run in runs]
+            with open(path, 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as out:
+                previous = None
+                for line in heapq.merge(*files):
+                    if line != previous:
+                        out.write(line)
+                        previous = line
+            for file in files:
+                file.close()
+
+    ########### Merge ###########
+    def compare(self, old_path, new_path):
+        # Lines only in the new snapshot are added, lines only in the old
+        # one removed. Both files are sorted, so one pass over each suffices
+        added = removed = 0
+        with open(old_path, encoding='utf-8', newline='\n') as old, \
+                open(new_path, encoding='utf-8', newline='\n') as new, \
+                open(self.added_path, 'w', encoding='utf-8', newline='\n') as added_file, \
+                open(self.removed_path, 'w', encoding='utf-8', newline='\n') as removed_file:
+            old_line, new_line = old.readline(), new.readline()
+            while old_line or new_line:
+                if old_line and (not new_line or old_line < new_line):
+                    removed_file.write(old_line)
+                    removed += 1
+                    old_line = old.readline()
+                elif new_line and (not old_line or new_line < old_line):
+                    added_file.write(new_line)
+                    added += 1
+                    new_line = new.readline()
+                else:
+                    old_line, new_line = old.readline(), new.readline()
+        return added, removed
+
+    ########### Patch formats ###########
+    def write_sparql(self, path):
+        # DELETE DATA then INSERT DATA, in requests of BATCH triples. N-Triples
+        # terms are valid SPARQL terms as they are
+        with open(path, 'w', encoding='utf-8', newline='\n') as out:
+            requests = 0
+            for operation, source in (('DELETE', self.removed_path), ('INSERT', self.added_path)):
+                with open(source, encoding='utf-8', newline='\n') as file:
+                    while True:
+                        batch = [line for _, line in zip(range(BATCH), file)]
+                        if not batch:
+                            break
+                        if requests:
+                            out.write(';\n')
+                        out.write(f'{operation} DATA {{\n')
+                        out.writelines(batch)
+                        out.write('}\n')
+                        requests += 1
+
+    def write_rdf_patch(self, path, previous, current):
+        # One transaction: deletes, then adds. The patch id and its previous
+        # one are derived from the snapshots, so patches chain build to build
+        with open(path, 'w', encoding='utf-8', newline='\n') as out:
+            out.write(f'H id <{current}> .\n')
+            out.write(f'H prev <{previous}> .\n')
+            out.write('TX .\n')
+            for operation, source in (('D', self.removed_path), ('A', self.added_path)):
+                with open(source, encoding='utf-8', newline='\n') as file:
+                    out.writelines(f'{operation} {line}' for line in file)
+            out.write('TC .\n')
+
+
+def ntriples_lines(path):
+    # The ABOX as N-Triples lines. Streamed formats are read line by line
+    # (N-Quads lose their graph name), the others are loaded first
+    if path.endswith(('.nt', '.nt.gz', '.nq', '.nq.gz')):
+        opener = gzip.open if path.endswith('.gz') else open
+        quads = '.nq' in path
+        with opener(path, 'rt', encoding='utf-8', newline='\n') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                if quads:
+                    subject, predicate, rest = split_line(line)
+                    line = f'{subject} {predicate} {rest.rsplit(" ", 1)[0]} .\n'
+                yield line
+    else:
+        table = TripleTable()
+        load(table, path)
+        terms = table.terms
+        for s, p, o in zip(*(column.tolist() for column in table.spo)):
+            yield f'{terms[s]} {terms[p]} {terms[o]} .\n'
+
+
+def snapshot_id(path):
+    # Name-based UUID of a snapshot's content
+    return uuid.uuid5(uuid.NAMESPACE_URL, 'sha256:' + file_hash(path)).urn
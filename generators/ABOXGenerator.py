@@ -1,270 +1,569 @@
 # SDM Project 2. Knowledge Graphs
 # ABOX generator
 # for handling csv and csv contents
-from pandas import read_csv, DataFrame, isna
-from rdflib import Graph, Namespace, Literal  # basic RDF handling
+from pandas import read_csv, to_numeric, DataFrame, Series, concat
+from rdflib import Namespace, Literal, URIRef  # basic RDF handling
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from generators.URNIndex import URNIndex
+from generators.URNMinter import URNMinter
+from generators.Mapping import Mapping, Node, Ref, Relation
+from generators.CitationGraph import CitationGraph
+from generators.TextIndex import write_text_index
+from generators.TripleSink import EncodedSink, NTriplesSink, StoreSink
+from generators.TableCache import TableCache
+from generators.Instrumentation import NoInstrumentation
+from generators.BuildManifest import BuildManifest, file_hash, table_hash, combine
+from importlib.util import find_spec
+from glob import glob
+import csv
+import json
 import os
 import os.path as op
+import tempfile
+
+# The pyarrow CSV parser is multi-threaded; pandas' own C parser is the
+# fallback, and is always used to read in chunks
+CSV_ENGINE = 'pyarrow' if find_spec('pyarrow') else 'c'
+# Nullable column types read as strings and coerced, so that a malformed
+# id or flag becomes NA instead of failing the whole read
+COERCED = {'Int64', 'boolean'}
+BOOLEANS = {'TRUE': True, 'FALSE': False}
+# Source of the URN tables and stages: every module of the generators
+# package, since the minter, indexes and sinks all shape what is emitted
+CODE = sorted(glob(op.join(op.dirname(op.abspath(__file__)), '*.py')))
 
 
 class ABOXGenerator():
 
     default_ttl_path = op.join(os.getcwd(), 'output', 'ABOX.ttl')
 
-    def __init__(self, baseURL='http://SDM.org/Lab2/', ttl_path=default_ttl_path):
+    # Declared column types of every input CSV, by the column names the
+    # stages give them. Columns typed None are never read, ids and flags
+    # are nullable so that malformed rows reach the integrity checks
+    csv_dtypes = {
+        'Node_paper.csv': {'csv_id_paper': 'Int64', 'name_paper': 'str', 'DOI': 'str',
+                           'abstract': 'str', 'pages': 'Int64'},
+        'Node_author.csv': {'name_author': 'str'},
+        'Node_affiliation.csv': {'type': 'category', 'name_affiliation': 'str'},
+        'Node_keywords.csv': {'name_keyword': 'str'},
+        'Node_journals.csv': {'name_venue': 'category'},
+        'Node_conference.csv': {'name_venue': 'category'},
+        'Node_volumes.csv': {'name_compilation': 'str', 'year': 'Int64'},
+        'Node_edition.csv': {'csv_id_edition': 'str', 'name_compilation': 'str',
+                             'edition_num': None, 'location': 'str', 'year': 'Int64'},
+        'Node_community.csv': {'name_community': 'category'},
+        'Edge_paper_author_reviews.csv': {'csv_id_paper': 'Int64', 'name_author': 'str',
+                                          'content': 'str', 'approves': 'boolean'},
+        'Edge_papers_author.csv': {'csv_id_paper': 'Int64', 'name_author': 'str',
+                                   'main_author': 'boolean'},
+        'Edge_affiliation_author.csv': {'name_author': 'str', 'name_affiliation': 'str'},
+        'Edge_paper_keywords.csv': {'csv_id_paper': 'Int64', 'name_keyword': 'category'},
+        'Edge_paper_paper.csv': {'subject_csv_id_paper': 'Int64', 'object_csv_id_paper': 'Int64'},
+        'Edge_paper_volumes.csv': {'csv_id_paper': 'Int64', 'name_compilation': 'str',
+                                   'short_volume': None},
+        'Edge_papers_edition.csv': {'csv_id_paper': 'Int64', 'csv_id_edition': 'str'},
+        'Edge_volumes_journal.csv': {'name_compilation': 'str', 'name_venue': 'category'},
+        'Edge_edition_conference.csv': {'csv_id_edition': 'str', 'name_venue': 'category'},
+        'Edge_conference_community.csv': {'name_venue': 'category', 'name_community': 'category'},
+        'Edge_journal_community.csv': {'name_venue': 'category', 'name_community': 'category'},
+    }
+
+    # The whole CSV -> RDF mapping: node types with their CSV, key,
+    # datatype properties and natural key, then every relation with the
+    # key columns it joins. Node stages run in this order, then edge stages
+    mapping = Mapping(nodes=(
+        Node('paper', 'nodes/Node_paper.csv', ('csv_id_paper', 'name_paper', 'DOI', 'abstract', 'pages'),
+             ('csv_id_paper',), ('name_paper', 'DOI', 'abstract', 'pages'),
+             key='csv_id_paper', urn_key=('csv_id_paper',)),
+        # Reviewers are the authors who have written at least one review.
+        # Reviewer is a subclass of Author, so they are not authors again
+        Node('reviewer', properties=('name_author',), key='name_author',
+             urn_key=('name_author',), distinct='review'),
+        Node('author', 'nodes/Node_author.csv', ('name_author',), properties=('name_author',),
+             key='name_author', resolves=('reviewer', 'author'), unique=True,
+             urn_key=('name_author',), excludes='reviewer'),
+        Node('review', 'edges/Edge_paper_author_reviews.csv',
+             ('csv_id_paper', 'name_author', 'content', 'approves'), ('csv_id_paper', 'name_author'),
+             ('content', 'approves'), urn_key=('csv_id_paper', 'name_author')),
+        Node('affiliation', 'nodes/Node_affiliation.csv', ('type', 'name_affiliation'),
+             ('name_affiliation',), ('type', 'name_affiliation'),
+             key='name_affiliation', urn_key=('name_affiliation',)),
+        Node('keyword', 'nodes/Node_keywords.csv', ('name_keyword',), properties=('name_keyword',),
+             key='name_keyword', urn_key=('name_keyword',)),
+        Node('journal', 'nodes/Node_journals.csv', ('name_venue',), properties=('name_venue',),
+             key='name_venue', urn_key=('name_venue',)),
+        Node('conference', 'nodes/Node_conference.csv', ('name_venue',), properties=('name_venue',),
+             key='name_venue', urn_key=('name_venue',)),
+        Node('volume', 'nodes/Node_volumes.csv', ('name_compilation', 'year'), ('name_compilation',),
+             ('name_compilation', 'year'), key='name_compilation', urn_key=('name_compilation',)),
+        Node('edition', 'nodes/Node_edition.csv',
+             ('csv_id_edition', 'name_compilation', 'edition_num', 'location', 'year'), ('csv_id_edition',),
+             ('name_compilation', 'year', 'location'), key='csv_id_edition', urn_key=('csv_id_edition',)),
+        Node('community', 'nodes/Node_community.csv', ('name_community',), properties=('name_community',),
+             key='name_community', urn_key=('name_community',)),
+    ), relations=(
+        # The first author of a paper is its corresponding author
+        Relation('writes', 'writes', Ref('author', 'name_author'), Ref('paper', 'csv_id_paper'),
+                 'edges/Edge_papers_author.csv', ('csv_id_paper', 'name_author', 'main_author'),
+                 ('csv_id_paper', 'name_author'), where=('main_author', False)),
+        Relation('writes', 'is_corresponding_author', Ref('author', 'name_author'), Ref('paper', 'csv_id_paper'),
+                 'edges/Edge_papers_author.csv', ('csv_id_paper', 'name_author', 'main_author'),
+                 ('csv_id_paper', 'name_author'), where=('main_author', True)),
+        Relation('writes_r', 'writes_r', Ref('reviewer', 'name_author'), Ref('review'), table='review'),
+        Relation('about', 'about', Ref('review'), Ref('paper', 'csv_id_paper'), table='review'),
+        Relation('belongs_to_a', 'belongs_to_a', Ref('author', 'name_author'),
+                 Ref('affiliation', 'name_affiliation'),
+                 'edges/Edge_affiliation_author.csv', ('name_author', 'name_affiliation')),
+        Relation('relates_to', 'relates_to', Ref('paper', 'csv_id_paper'), Ref('keyword', 'name_keyword'),
+                 'edges/Edge_paper_keywords.csv', ('csv_id_paper', 'name_keyword')),
+        Relation('cites', 'cites', Ref('paper', 'subject_csv_id_paper', 'subject_paper'),
+                 Ref('paper', 'object_csv_id_paper', 'object_paper'),
+                 'edges/Edge_paper_paper.csv', ('subject_csv_id_paper', 'object_csv_id_paper')),
+        Relation('published_in_v', 'published_in_v', Ref('paper', 'csv_id_paper'),
+                 Ref('volume', 'name_compilation'), 'edges/Edge_paper_volumes.csv',
+                 ('csv_id_paper', 'name_compilation', 'short_volume'), ('csv_id_paper', 'name_compilation')),
+        Relation('published_in_e', 'published_in_e', Ref('paper', 'csv_id_paper'),
+                 Ref('edition', 'csv_id_edition'),
+                 'edges/Edge_papers_edition.csv', ('csv_id_paper', 'csv_id_edition')),
+        Relation('belongs_to_j', 'belongs_to_j', Ref('volume', 'name_compilation'),
+                 Ref('journal', 'name_venue'),
+                 'edges/Edge_volumes_journal.csv', ('name_compilation', 'name_venue')),
+        Relation('belongs_to_c', 'belongs_to_c', Ref('edition', 'csv_id_edition'),
+                 Ref('conference', 'name_venue'),
+                 'edges/Edge_edition_conference.csv', ('csv_id_edition', 'name_venue')),
+        Relation('c_in', 'c_in', Ref('conference', 'name_venue'), Ref('community', 'name_community'),
+                 'edges/Edge_conference_community.csv', ('name_venue', 'name_community')),
+        Relation('j_in', 'j_in', Ref('journal', 'name_venue'), Ref('community', 'name_community'),
+                 'edges/Edge_journal_community.csv', ('name_venue', 'name_community')),
+    ))
+    plan = mapping.compile()
+
+    def __init__(self, baseURL='http://SDM.org/Lab2/', ttl_path=default_ttl_path, format='turtle',
+                 workers=1, incremental=False, chunksize=None, cache_path=TableCache.default_path,
+                 metrics=False, urn_scheme='positional', instrument=None, text_index=False):
 
         print('Generating ABOX...')
 
+        self.chunksize = chunksize
+        # Time, rows, triples and memory of every stage, when given
+        self.instrument = instrument or NoInstrumentation()
+        self.minter = URNMinter(urn_scheme)
+
         self.n = Namespace(baseURL)
-        self.g = Graph()
-        self.g.bind('', self.n)
+        self.quads = format == 'nquads'
+        # 'turtle' encodes the whole graph in memory before writing it
+        # subject by subject (sorted, or in order of first appearance for
+        # 'fast-turtle', or as a binary HDT-style file for 'hdt'),
+        # 'nt' and 'nquads' stream every stage's triples straight to disk,
+        # 'store' adds them to a persistent SQLite triple store
+        if format in ('turtle', 'fast-turtle', 'hdt'):
+            self.sink = EncodedSink(ttl_path, self.n, format)
+            self.table = self.sink.table
+        elif format == 'nt':
+            self.sink = NTriplesSink(ttl_path)
+        elif format == 'nquads':
+            self.sink = NTriplesSink(ttl_path, graph=self.graph_name())
+        elif format == 'store':
+            self.sink = StoreSink(ttl_path, self.n)
+        else:
+            raise ValueError(f'Unknown ABOX format: {format}')
 
         cwd = os.getcwd()
-        data_path = op.join(cwd, 'data')
-        nodes_path = op.join(data_path, 'nodes')
-        edges_path = op.join(data_path, 'edges')
-
-        ############ Assert Nodes ############
-        print('Asserting nodes...')
-
-        # paper, author, reviewer
-        df_paper = self.load_clean_csv(
-            op.join(nodes_path, 'Node_paper.csv'), ['csv_id_paper', 'name_paper', 'DOI', 'abstract', 'pages'], ['csv_id_paper'])
-        df_paper = self.generate_urn(df_paper, 'paper')
-        self.assert_nodes(df_paper, 'paper', [
-                          'name_paper', 'DOI', 'abstract', 'pages'])
-
-        df_author = self.load_clean_csv(
-            op.join(nodes_path, 'Node_author.csv'), ['name_author'])
-
-        df_review = self.load_clean_csv(
-            op.join(edges_path, 'Edge_paper_author_reviews.csv'), ['csv_id_paper', 'name_author', 'content', 'approves'], ['csv_id_paper', 'name_author'])
-
-        # Reviewers are authors who have written at least one review
-        self.reviewers = df_review['name_author'].unique()
-        self.df_reviewer = DataFrame(self.reviewers, columns=['name_author'])
-        self.df_reviewer = self.generate_urn(self.df_reviewer, 'reviewer')
-        self.assert_nodes(self.df_reviewer, 'reviewer', ['name_author'])
-
-        # Reviewer is a subclass of Author, so we skip them
-        df_author = df_author[~df_author['name_author']
-                              .isin(self.reviewers)]
-        self.df_author = self.generate_urn(df_author, 'author')
-        self.assert_nodes(self.df_author, 'author', ['name_author'])
-
-        # Reviews
-        df_review = self.generate_urn(df_review, 'review')
-        self.assert_nodes(df_review, 'review', ['content', 'approves'])
-
-        # affiliations
-        df_affiliation = self.load_clean_csv(
-            op.join(nodes_path, 'Node_affiliation.csv'), ['type', 'name_affiliation'], ['name_affiliation'])
-        df_affiliation = self.generate_urn(df_affiliation, 'affiliation')
-        self.assert_nodes(df_affiliation, 'affiliation',
-                          ['type', 'name_affiliation'])
-
-        # keywords
-        df_keyword = self.load_clean_csv(
-            op.join(nodes_path, 'Node_keywords.csv'), ['name_keyword'])
-        df_keyword = self.generate_urn(df_keyword, 'keyword')
-        self.assert_nodes(df_keyword, 'keyword', ['name_keyword'])
-
-        # journals
-        df_journal = self.load_clean_csv(
-            op.join(nodes_path, 'Node_journals.csv'), ['name_venue'])
-        df_journal = self.generate_urn(df_journal, 'journal')
-        self.assert_nodes(df_journal, 'journal', ['name_venue'])
-
-        # conferences
-        df_conference = self.load_clean_csv(
-            op.join(nodes_path, 'Node_conference.csv'), ['name_venue'])
-        df_conference = self.generate_urn(df_conference, 'conference')
-        self.assert_nodes(df_conference, 'conference', ['name_venue'])
-
-        # volumes
-        df_volume = self.load_clean_csv(
-            op.join(nodes_path, 'Node_volumes.csv'), ['name_compilation', 'year'], ['name_compilation'])
-        df_volume = self.generate_urn(df_volume, 'volume')
-        self.assert_nodes(df_volume, 'volume', ['name_compilation', 'year'])
-
-        # editions
-        df_edition = self.load_clean_csv(
-            op.join(nodes_path, 'Node_edition.csv'), ['csv_id_edition', 'name_compilation', 'edition_num', 'year', 'location'], ['csv_id_edition'])
-        df_edition = self.generate_urn(df_edition, 'edition')
-        self.assert_nodes(df_edition, 'edition', [
-                          'name_compilation', 'year', 'location'])
-
-        # communities
-        df_community = self.load_clean_csv(
-            op.join(nodes_path, 'Node_community.csv'), ['name_community'])
-        df_community = self.generate_urn(df_community, 'community')
-        self.assert_nodes(df_community, 'community', ['name_community'])
-        print('Nodes asserted!')
-
-        ########### Assert Properties ###########
-        print('Asserting properties...')
-        df_paper_auth = self.load_clean_csv(
-            op.join(edges_path, 'Edge_papers_author.csv'), ['csv_id_paper', 'name_author', 'main_author'], ['csv_id_paper', 'name_author'])
-        df_paper_auth = df_paper_auth.merge(df_paper.loc[:, ['paper', 'csv_id_paper']],
-                                            how='left', on='csv_id_paper')
-        self.df_paper_auth = df_paper_auth
-        self.df_paper_auth['author'] = self.df_paper_auth['name_author'].apply(
-            self.get_author_urn)
-
-        # writes
-        df_writes = df_paper_auth[~df_paper_auth['main_author']]
-        self.assert_properties(
-            df_writes, 'author', 'writes', 'paper')
-
-        # is_corresponding_author
-        df_corresponding_author = df_paper_auth[df_paper_auth['main_author']]
-        self.assert_properties(
-            df_corresponding_author, 'author', 'is_corresponding_author', 'paper')
-
-        #  writes_r
-        df_writes_r = df_review.merge(
-            self.df_reviewer, how='left', on='name_author')
-        self.assert_properties(df_writes_r, 'reviewer', 'writes_r', 'review')
-
-        # about
-        df_about = df_review.merge(df_paper, how='left', on='csv_id_paper')
-        self.assert_properties(df_about, 'review', 'about', 'paper')
-
-        # belongs_to_a
-        df_aff_auth = self.load_clean_csv(
-            op.join(edges_path, 'Edge_affiliation_author.csv'), ['name_author', 'name_affiliation'])
-        df_aff_auth = df_aff_auth.merge(
-            df_affiliation, how='left', on='name_affiliation')
-        df_aff_auth['author'] = df_aff_auth['name_author'].apply(
-            self.get_author_urn)
-        self.assert_properties(
-            df_aff_auth, 'author', 'belongs_to_a', 'affiliation')
-
-        # relates_to
-        df_paper_keyw = self.load_clean_csv(
-            op.join(edges_path, 'Edge_paper_keywords.csv'), ['csv_id_paper', 'name_keyword'])
-        df_paper_keyw = df_paper_keyw.merge(
-            df_paper.loc[:, ['csv_id_paper', 'paper']], how='left', on='csv_id_paper')
-        df_paper_keyw = df_paper_keyw.merge(
-            df_keyword, how='left', on='name_keyword')
-        self.assert_properties(df_paper_keyw, 'paper', 'relates_to', 'keyword')
-
-        # cites
-        df_cites = self.load_clean_csv(
-            op.join(edges_path, 'Edge_paper_paper.csv'), ['subject_csv_id_paper', 'object_csv_id_paper'])
-        df_cites = df_cites.merge(df_paper.loc[:, ['csv_id_paper', 'paper']], how='left', left_on='subject_csv_id_paper', right_on='csv_id_paper')\
-            .rename(columns={'paper': 'subject_paper'})
-        df_cites = df_cites.merge(df_paper.loc[:, ['csv_id_paper', 'paper']], how='left', left_on='object_csv_id_paper', right_on='csv_id_paper')\
-            .rename(columns={'paper': 'object_paper'})
-        self.assert_properties(df_cites, 'subject_paper',
-                               'cites', 'object_paper')
-
-        # published_in_v
-        df_paper_vol = self.load_clean_csv(
-            op.join(edges_path, 'Edge_paper_volumes.csv'), ['csv_id_paper', 'name_compilation', 'short_volume'], ['csv_id_paper', 'name_compilation'])
-        df_paper_vol = df_paper_vol.merge(
-            df_paper.loc[:, ['csv_id_paper', 'paper']], how='left', on='csv_id_paper')
-        df_paper_vol = df_paper_vol.merge(
-            df_volume.loc[:, ['name_compilation', 'volume']], how='left', on='name_compilation')
-        self.assert_properties(df_paper_vol, 'paper',
-                               'published_in_v', 'volume')
-
-        # published_in_e
-        df_paper_ed = self.load_clean_csv(
-            op.join(edges_path, 'Edge_papers_edition.csv'), ['csv_id_paper', 'csv_id_edition'])
-        df_paper_ed = df_paper_ed.merge(df_paper.loc[:, [
-                                        'csv_id_paper', 'paper']], how='left', on='csv_id_paper')
-        df_paper_ed = df_paper_ed.merge(
-            df_edition.loc[:, ['csv_id_edition', 'edition']], how='left', on='csv_id_edition')
-        self.assert_properties(df_paper_ed, 'paper',
-                               'published_in_e', 'edition')
-
-        # belongs_to_j
-        df_vol_journal = self.load_clean_csv(
-            op.join(edges_path, 'Edge_volumes_journal.csv'), ['name_compilation', 'name_venue'])
-        df_vol_journal = df_vol_journal.merge(
-            df_volume.loc[:, ['name_compilation', 'volume']], how='left', on='name_compilation')
-        df_vol_journal = df_vol_journal.merge(
-            df_journal, how='left', on='name_venue')
-        self.assert_properties(
-            df_vol_journal, 'volume', 'belongs_to_j', 'journal')
-
-        # belongs_to_c
-        df_ed_conf = self.load_clean_csv(
-            op.join(edges_path, 'Edge_edition_conference.csv'), ['csv_id_edition', 'name_venue'])
-        df_ed_conf = df_ed_conf.merge(
-            df_edition.loc[:, ['csv_id_edition', 'edition']], how='left', on='csv_id_edition')
-        df_ed_conf = df_ed_conf.merge(
-            df_conference, how='left', on='name_venue')
-        self.assert_properties(df_ed_conf, 'edition',
-                               'belongs_to_c', 'conference')
-
-        # c_in
-        df_conf_comm = self.load_clean_csv(
-            op.join(edges_path, 'Edge_conference_community.csv'), ['name_venue', 'name_community'])
-        df_conf_comm = df_conf_comm.merge(
-            df_conference, how='left', on='name_venue')
-        df_conf_comm = df_conf_comm.merge(
-            df_community, how='left', on='name_community')
-        self.assert_properties(
-            df_conf_comm, 'conference', 'c_in', 'community')
-
-        # j_in
-        df_journal_comm = self.load_clean_csv(
-            op.join(edges_path, 'Edge_journal_community.csv'), ['name_venue', 'name_community'])
-        df_journal_comm = df_journal_comm.merge(
-            df_journal, how='left', on='name_venue')
-        df_journal_comm = df_journal_comm.merge(
-            df_community, how='left', on='name_community')
-        self.assert_properties(
-            df_journal_comm, 'journal', 'j_in', 'community')
-
-        print('Properties asserted!')
+        self.data_path = op.join(cwd, 'data')
+        self.edges_path = op.join(self.data_path, 'edges')
+        self.cache_path = cache_path
+        integrity_path = op.join(op.dirname(ttl_path), 'integrity.json')
+
+        print('Building URN tables...')
+        with self.instrument.stage('ABOX', 'tables'):
+            self.tables = self.build_tables()
+        print('URN tables built!')
+
+        print('Asserting nodes and properties...')
+        if incremental:
+            # Shards and their manifest persist between builds
+            shard_dir = op.join(op.dirname(ttl_path), 'shards')
+            os.makedirs(shard_dir, exist_ok=True)
+            self.run_sharded(workers, shard_dir, BuildManifest(
+                op.join(shard_dir, 'manifest.json')))
+        elif workers > 1:
+            with tempfile.TemporaryDirectory(dir=op.dirname(ttl_path)) as shard_dir:
+                self.run_sharded(workers, shard_dir)
+        else:
+            for stage in self.plan.stages:
+                self.run_stage(stage, self.tables)
+        print(f'{self.write_integrity_report(integrity_path)} dangling edge(s) dropped, '
+              f'see {op.basename(integrity_path)}')
+
+        if metrics:
+            print('Asserting citation metrics...')
+            with self.instrument.stage('ABOX', 'metrics'):
+                self.assert_citation_metrics(op.join(op.dirname(ttl_path), 'citations.json'))
+            print('Citation metrics asserted!')
+        if text_index:
+            print('Indexing paper text...')
+            with self.instrument.stage('ABOX', 'text_index'):
+                terms, postings = self.write_text_index(op.join(op.dirname(ttl_path), 'TEXT.idx'))
+            print(f'Paper text indexed! ({terms} terms, {postings} postings)')
+        print('Nodes and properties asserted!')
 
         ########## Generate .ttl ############
         print('Serializing ABOX...')
-        self.g.serialize(destination=ttl_path)
+        with self.instrument.stage('ABOX', 'serialize'):
+            self.sink.close()
         print('ABOX serialized!')
 
         print('ABOX generated!')
         return None
 
-    def load_clean_csv(self, path, columns, ids=None):
-        if not ids:
-            ids = columns
-        df = read_csv(path, sep=',', header=0, names=columns)
-        # Remove rows with missing id value(s)
-        df.loc[:, ids].dropna(inplace=True)
-        # Assert id uniqueness
-        df.loc[:, ids].drop_duplicates(inplace=True)
+    def build_tables(self):
+        # The cleaned URN tables come from the cache while their source CSVs
+        # and this module are unchanged
+        tables = None
+        if self.cache_path:
+            cache = TableCache(self.cache_path)
+            fingerprint = cache.fingerprint(
+                [op.join(self.data_path, csv) for csv in self.plan.table_csvs],
+                *[file_hash(path) for path in CODE], self.minter.scheme)
+            tables = cache.load(fingerprint)
+            print('URN tables loaded from cache' if tables is not None
+                  else 'URN table cache is stale, rebuilding it')
+        if tables is None:
+            tables = self.clean_tables()
+            if self.cache_path:
+                cache.save(tables, fingerprint)
+
+        # Key -> URN index per node type, hashed once and shared by every
+        # edge stage that refers to it
+        for index in self.plan.indexes:
+            urns = URNIndex(index.name[:-len('_index')])
+            for node in index.nodes:
+                urns.add(tables[node], index.key, node, unique=index.unique)
+            tables[index.name] = urns
+        return tables
+
+    def clean_tables(self):
+        # Node tables in the plan's order, every derived table after the
+        # tables it is derived from
+        tables = {}
+        for step in self.plan.tables:
+            node = step.node
+            if step.csv:
+                df = self.load_clean_csv(op.join(self.data_path, step.csv), list(step.columns), step.used)
+            else:
+                df = DataFrame(tables[step.distinct][node.key].unique(), columns=[node.key])
+            if step.excludes:
+                df = df[~df[node.key].isin(tables[step.excludes][node.key])]
+            tables[node.name] = self.generate_urn(df, node.name)
+
+        # Plain positional indexes, as the cached tables have
+        return {node.name: tables[node.name].reset_index(drop=True) for node in self.mapping.nodes}
+
+    ########### Stage scheduling ###########
+    def run_stage(self, stage, tables):
+        with self.instrument.stage('ABOX', stage.name):
+            if stage.properties:
+                self.instrument.count_rows(len(tables[stage.source]))
+                self.assert_nodes(tables[stage.source], stage.source, stage.properties)
+            else:
+                self.assert_edges(stage, tables)
+
+    def run_sharded(self, workers, shard_dir, manifest=None):
+        # Every stage writes its own shard, in a worker process if workers > 1.
+        # Shards are merged in stage order, so the output does not depend on
+        # which stage finishes first. With a manifest, stages whose inputs
+        # are unchanged since the last build reuse their shard
+        shards = {stage.name: op.join(shard_dir, stage.name + '.nt')
+                  for stage in self.plan.stages}
+        stale = self.plan.stages
+        if manifest is not None:
+            fingerprints, inputs = self.fingerprint_stages()
+            stale = [stage for stage in self.plan.stages if not manifest.is_fresh(
+                stage.name, fingerprints[stage.name], shards[stage.name])]
+            print(f'{len(self.plan.stages) - len(stale)} of {len(self.plan.stages)} '
+                  'stages unchanged since the last build')
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.run_shard, stage,
+                                           {t: self.tables[t] for t in stage.tables},
+                                           shards[stage.name])
+                           for stage in stale]
+                unresolved = [future.result() for future in futures]
+        else:
+            unresolved = [self.run_shard(stage, self.tables, shards[stage.name])
+                          for stage in stale]
+
+        unresolved = dict(zip([stage.name for stage in stale], unresolved))
+        for index in self.indexes(self.tables):
+            self.tables[index].unresolved = {}
+        for stage in self.plan.stages:
+            if manifest is not None:
+                if stage.name in unresolved:
+                    manifest.record(stage.name, fingerprints[stage.name], inputs[stage.name],
+                                    shards[stage.name], unresolved[stage.name])
+                else:
+                    unresolved[stage.name] = manifest.stages[stage.name]['unresolved']
+            # Dangling edges counted while the stage ran
+            for index, counts in unresolved[stage.name].items():
+                self.tables[index].unresolved.update(counts)
+            self.sink.add_shard(shards[stage.name])
+        if manifest is not None:
+            manifest.save()
+
+    def run_shard(self, stage, tables, shard):
+        # Also runs in worker processes, on a copy of the generator without
+        # its sink. Returns the stage's integrity counts per index
+        sink = getattr(self, 'sink', None)
+        self.sink = NTriplesSink(
+            shard, graph=self.graph_name() if self.quads else None)
+        for index in self.indexes(tables):
+            tables[index].unresolved = {}
+        self.run_stage(stage, tables)
+        self.sink.close()
+        self.sink = sink
+        return {index: tables[index].unresolved for index in self.indexes(tables)}
+
+    def indexes(self, tables):
+        return [name for name in tables if name.endswith('_index')]
+
+    def write_integrity_report(self, path):
+        # Checked and dangling edges per relation and key column, and nodes
+        # with an NA key, over all indexes
+        relations = {}
+        unkeyed = {}
+        for index in self.indexes(self.tables):
+            self.tables[index].report()
+            for relation, keys in self.tables[index].unresolved.items():
+                relations.setdefault(relation, {}).update(keys)
+            unkeyed.update(self.tables[index].unkeyed)
+        dangling = sum(counts['dangling'] for keys in relations.values()
+                       for counts in keys.values())
+        with open(path, 'w') as file:
+            json.dump({'dangling': dangling, 'relations': relations, 'unkeyed': unkeyed},
+                      file, indent=1, sort_keys=True)
+        return dangling
+
+    def fingerprint_stages(self):
+        # A stage's fingerprint covers its edge CSVs, its URN tables and
+        # everything else that shapes its shard
+        code = combine(*[file_hash(path) for path in CODE])
+        tables = {name: table_hash(table) for name, table in self.tables.items()}
+        fingerprints, inputs = {}, {}
+        for stage in self.plan.stages:
+            inputs[stage.name] = {csv: file_hash(op.join(self.data_path, csv))
+                                  for csv in stage.csvs}
+            inputs[stage.name].update({table: tables[table] for table in stage.tables})
+            fingerprints[stage.name] = combine(
+                code, str(self.n), str(self.quads), str(self.chunksize), stage.name,
+                *[f'{name}:{digest}' for name, digest in sorted(inputs[stage.name].items())])
+        return fingerprints, inputs
+
+    def __getstate__(self):
+        # Workers receive the tables they need explicitly; the sink (an open
+        # file or a whole graph) stays in the main process
+        state = self.__dict__.copy()
+        for attribute in ('sink', 'table', 'tables'):
+            state.pop(attribute, None)
+        return state
+
+    def graph_name(self):
+        return self.n.term('ABOX')
+
+    ########### Edge stages ###########
+    def assert_edges(self, stage, tables):
+        # Batches of rows from the stage's CSV (in chunks) or node table.
+        # Every key column is resolved once, dangling rows are dropped, and
+        # each relation of the stage asserts its rows at once
+        if stage.csv:
+            batches = self.iter_clean_csv(op.join(self.data_path, stage.csv), list(stage.columns),
+                                          stage.used)
+        else:
+            self.instrument.count_rows(len(tables[stage.source]))
+            batches = [tables[stage.source]]
+        for df in batches:
+            for lookup in stage.lookups:
+                df = tables[lookup.index].resolve(df, lookup.column, lookup.urn, stage.name)
+            for emit in stage.emits:
+                rows = df
+                if emit.where is not None:
+                    column, value = emit.where
+                    rows = df[df[column] == value]
+                self.assert_properties(rows, emit.subject, emit.property, emit.object)
+
+    ########### Citation metrics ###########
+    def assert_citation_metrics(self, report_path, top=10):
+        # Citation analytics over the whole cites relation, after the
+        # stages: in-degree and PageRank on papers, total citations and
+        # h-index on authors, and per-community aggregates in a report
+        tables = self.tables
+        df_paper = tables['paper']
+        # csv_id_paper -> position of the paper in df_paper
+        positions = URNIndex('paper')
+        positions.add(df_paper.assign(position=np.arange(len(df_paper))), 'csv_id_paper', 'position')
+
+        df_cites = self.load_clean_csv(
+            op.join(self.edges_path, 'Edge_paper_paper.csv'), ['subject_csv_id_paper', 'object_csv_id_paper'])
+        df_cites = positions.lookup(df_cites, 'subject_csv_id_paper', 'citing')
+        df_cites = positions.lookup(df_cites, 'object_csv_id_paper', 'cited').dropna(subset=['citing', 'cited'])
+        graph = CitationGraph(len(df_paper), df_cites['citing'].to_numpy(dtype=np.int64),
+                              df_cites['cited'].to_numpy(dtype=np.int64))
+        citations, pagerank = graph.in_degree(), graph.pagerank()
+        self.assert_values(df_paper['paper'], 'citation_count', citations)
+        self.assert_values(df_paper['paper'], 'pagerank', pagerank)
+
+        # Authors, over every paper they wrote
+        df_writes = self.load_clean_csv(
+            op.join(self.edges_path, 'Edge_papers_author.csv'), ['csv_id_paper', 'name_author', 'main_author'])
+        df_writes = positions.lookup(df_writes, 'csv_id_paper', 'position')
+        df_writes = tables['author_index'].lookup(df_writes, 'name_author', 'author')\
+            .dropna(subset=['position', 'author'])
+        authors, groups = np.unique(df_writes['author'].to_numpy(dtype=str), return_inverse=True)
+        _, total, h_index = graph.aggregate(groups, df_writes['position'].to_numpy(dtype=np.int64),
+                                            len(authors), citations)
+        self.assert_values(authors, 'total_citations', total)
+        self.assert_values(authors, 'h_index', h_index)
+
+        # Communities, through the venue of every paper
+        memberships = self.paper_communities(positions)
+        communities, groups = np.unique(memberships['name_community'].to_numpy(dtype=str), return_inverse=True)
+        papers = memberships['position'].to_numpy(dtype=np.int64)
+        n_papers, total_c, h_index_c = graph.aggregate(groups, papers, len(communities), citations)
+
+        ranked = np.argsort(-pagerank, kind='stable')[:top]
+        report = {
+            'papers': len(df_paper), 'citations': len(graph),
+            'top_papers': [{'paper': df_paper['paper'].iloc[i], 'name': df_paper['name_paper'].iloc[i],
+                            'citations': int(citations[i]), 'pagerank': float(pagerank[i])}
+                           for i in ranked],
+            'top_authors': [{'author': authors[i], 'citations': int(total[i]), 'h_index': int(h_index[i])}
+                            for i in np.lexsort((-total, -h_index))[:top]],
+            'communities': {name: {'papers': int(n_papers[i]), 'citations': int(total_c[i]),
+                                   'h_index': int(h_index_c[i])}
+                            for i, name in enumerate(communities)},
+        }
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    def paper_communities(self, positions):
+        # (community name, paper position) pairs, through volumes and
+        # journals or editions and conferences
+        memberships = []
+        for paper_csv, columns, venue_csv, community_csv in (
+                ('Edge_paper_volumes.csv', ['csv_id_paper', 'name_compilation', 'short_volume'],
+                 'Edge_volumes_journal.csv', 'Edge_journal_community.csv'),
+                ('Edge_papers_edition.csv', ['csv_id_paper', 'csv_id_edition'],
+                 'Edge_edition_conference.csv', 'Edge_conference_community.csv')):
+            key = columns[1]
+            df = self.load_clean_csv(op.join(self.edges_path, paper_csv), columns, columns[:2])
+            venues, communities = URNIndex('venue'), URNIndex('community')
+            venues.add(self.load_clean_csv(op.join(self.edges_path, venue_csv), [key, 'name_venue']),
+                       key, 'name_venue', unique=False)
+            communities.add(self.load_clean_csv(op.join(self.edges_path, community_csv), ['name_venue', 'name_community']),
+                            'name_venue', 'name_community', unique=False)
+            df = positions.lookup(df, 'csv_id_paper', 'position')
+            df = venues.lookup(df, key, 'name_venue')
+            df = communities.lookup(df, 'name_venue', 'name_community')
+            memberships.append(df.loc[:, ['name_community', 'position']].dropna())
+        return concat(memberships).drop_duplicates()
+
+    ########### Full-text index ###########
+    def write_text_index(self, path):
+        # Titles, abstracts and keyword names of every paper, tokenized into
+        # posting lists of paper URIs
+        df_paper = self.tables['paper']
+        df_keywords = self.load_clean_csv(
+            op.join(self.edges_path, 'Edge_paper_keywords.csv'), ['csv_id_paper', 'name_keyword'])
+        df_keywords = self.tables['paper_index'].lookup(df_keywords, 'csv_id_paper', 'paper')\
+            .dropna(subset=['paper'])
+        self.instrument.count_rows(len(df_paper) + len(df_keywords))
+        urns = concat([df_paper['paper'], df_paper['paper'], df_keywords['paper']])
+        texts = concat([df_paper['name_paper'], df_paper['abstract'],
+                        df_keywords['name_keyword'].astype(object)])
+        return write_text_index(path, str(self.n) + urns.astype(str), texts)
+
+    def assert_values(self, urns, property, values):
+        # One literal per node
+        property_uri = self.n.term(property)
+        self.instrument.count_triples(len(values))
+        self.sink.add((uri, property_uri, Literal(value))
+                      for uri, value in zip(self.to_uris(Series(urns)), values.tolist()))
+
+    def load_clean_csv(self, path, columns, used=None):
+        options, names = self.csv_options(path, columns, used or columns)
+        df = read_csv(path, sep=',', header=0, engine=CSV_ENGINE, **options)
+        return self.coerce(df.rename(columns=names)[list(names.values())], path)
+
+    def iter_clean_csv(self, path, columns, used=None):
+        # Edge stages consume their CSV in chunks of self.chunksize rows, so
+        # an edge file is never fully resident. Without a chunk size the
+        # whole file is a single chunk
+        if not self.chunksize:
+            df = self.load_clean_csv(path, columns, used)
+            self.instrument.count_rows(len(df))
+            yield df
+            return
+        options, names = self.csv_options(path, columns, used or columns)
+        with read_csv(path, sep=',', header=0, chunksize=self.chunksize, **options) as chunks:
+            for df in chunks:
+                self.instrument.count_rows(len(df))
+                yield self.coerce(df.rename(columns=names)[list(names.values())], path)
+
+    def csv_options(self, path, columns, used):
+        # Declared types of the columns read (by default those the mapping
+        # uses), other columns are skipped. The pyarrow parser selects and
+        # types columns by the file's own header, so the options name them
+        # as the header does, and the names map them back to the mapping's
+        dtypes = self.csv_dtypes.get(op.basename(path), {})
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            header = dict(zip(columns, next(csv.reader(file))))
+        read = [column for column in used if dtypes.get(column, 'str')]
+        return ({'usecols': [header[column] for column in read],
+                 'dtype': {header[column]: 'str' if dtypes[column] in COERCED else dtypes[column]
+                           for column in read if column in dtypes}},
+                {header[column]: column for column in read})
+
+    def coerce(self, df, path):
+        # Nullable columns from their strings: values that are not an
+        # integer or TRUE/FALSE become NA, and rows with an NA key are
+        # counted and dropped as dangling edges
+        dtypes = self.csv_dtypes.get(op.basename(path), {})
+        for column in df.columns:
+            if dtypes.get(column) == 'Int64':
+                values = to_numeric(df[column], errors='coerce')
+                df[column] = values.where(values % 1 == 0).astype('Int64')
+            elif dtypes.get(column) == 'boolean':
+                df[column] = df[column].str.upper().map(BOOLEANS).astype('boolean')
         return df
 
     def assert_nodes(self, df, id, properties):
-        for _, node in df.iterrows():
-            node_uri = self.n.term(node[id])
-            for property in properties:
-                # If the property is not nan, assert it
-                if not isna(node[property]):
-                    property_uri = self.n.term(property)
-                    self.g.add((node_uri, property_uri,
-                               Literal(node[property])))
+        # Column at a time: node URIs are built once and reused for every
+        # property, NaNs are masked once per column
+        node_uris = self.to_uris(df[id])
+        for property in properties:
+            values = df[property]
+            mask = values.notna().to_numpy()
+            self.instrument.count_triples(mask.sum())
+            property_uri = self.n.term(property)
+            self.sink.add((node_uri, property_uri, Literal(value))
+                          for node_uri, value in zip(node_uris[mask], values[mask].tolist()))
 
     def assert_properties(self, df, subject_id, property, object_id):
-        for _, edge in df.iterrows():
-            subject_uri = self.n.term(edge[subject_id])
-            object_uri = self.n.term(edge[object_id])
-            property_uri = self.n.term(property)
-            self.g.add((subject_uri, property_uri, object_uri))
+        subject_uris = self.to_uris(df[subject_id])
+        object_uris = self.to_uris(df[object_id])
+        property_uri = self.n.term(property)
+        self.instrument.count_triples(len(df))
+        self.sink.add((subject_uri, property_uri, object_uri)
+                      for subject_uri, object_uri in zip(subject_uris, object_uris))
+
+    def to_uris(self, urns):
+        # Prefix the whole column with the namespace in one vectorized pass
+        uris = (str(self.n) + urns.astype(str)).tolist()
+        return np.array([URIRef(uri) for uri in uris], dtype=object)
 
     def generate_urn(self, df, id):
-        df[id] = [id + str(i) for i in range(len(df))]
-        return df
-
-    def get_author_urn(self, author):
-        if author in self.reviewers:
-            return self.df_reviewer\
-                .loc[self.df_reviewer['name_author'] == author, 'reviewer'].iloc[0]
-        return self.df_author.loc[self.df_author['name_author'] == author, 'author'].iloc[0]
+        return self.minter.mint(df, id, self.plan.urn_keys[id])
 
 
 if __name__ == '__main__':
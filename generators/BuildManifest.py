@@ -0,0 +1,83 @@
+# SDM Project 2. Knowledge Graphs
+# Build manifest: content fingerprints of every stage's inputs and shard,
+# so unchanged stages can reuse the shard of the previous build. Also the
+# build version stamp that query processes compare with the build they loaded
+from pandas.util import hash_pandas_object
+import hashlib
+import json
+import os.path as op
+import time
+
+
+class BuildManifest():
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+        if op.exists(path):
+            with open(path) as file:
+                self.stages = json.load(file)['stages']
+
+    def is_fresh(self, stage, fingerprint, shard):
+        # The shard on disk must still be the one recorded: the size rules
+        # out most changes before the file is hashed
+        entry = self.stages.get(stage)
+        return entry is not None and entry['fingerprint'] == fingerprint\
+            and op.exists(shard) and op.getsize(shard) == entry['shard_size']\
+            and file_hash(shard) == entry['shard_hash']
+
+    def record(self, stage, fingerprint, inputs, shard, unresolved):
+        self.stages[stage] = {'fingerprint': fingerprint, 'inputs': inputs,
+                              'shard_hash': file_hash(shard),
+                              'shard_size': op.getsize(shard),
+                              'unresolved': unresolved}
+
+    def save(self):
+        with open(self.path, 'w') as file:
+            json.dump({'stages': self.stages}, file, indent=1, sort_keys=True)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_hash(table):
+    # URN tables are DataFrames, or URNIndex objects holding a Series
+    table = getattr(table, 'urns', table)
+    return hashlib.sha256(hash_pandas_object(table).to_numpy().tobytes()).hexdigest()
+
+
+def combine(*hashes):
+    return hashlib.sha256('\n'.join(hashes).encode()).hexdigest()
+
+
+def stamp_build(path, sources):
+    # Build version: the content hash of the generated files. Identical
+    # builds get the same version
+    version = combine(*[f'{op.basename(source)}:{file_hash(source)}' for source in sources])
+    with open(path, 'w') as file:
+        json.dump({'version': version, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'files': [op.basename(source) for source in sources]}, file, indent=1)
+    return version
+
+
+def build_version(path):
+    # Version stamped by the last build, or None
+    try:
+        with open(path) as file:
+            return json.load(file)['version']
+    except FileNotFoundError:
+        return None
+
+
+def build_files(path):
+    # Names of the files of the last build, or None
+    try:
+        with open(path) as file:
+            return json.load(file)['files']
+    except FileNotFoundError:
+        return None
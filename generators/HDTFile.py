@@ -0,0 +1,281 @@
+# SDM Project 2. Knowledge Graphs
+# HDT-style binary RDF in a single file: a front-coded term dictionary and
+# bitmap triples (the sorted subjects, one predicate list per subject and one
+# object list per subject-predicate pair, delimited by bitmaps). The reader
+# memory-maps the file and answers triple patterns without parsing it
+from rdflib import URIRef
+from rdflib.store import Store, VALID_STORE, NO_STORE
+from generators.NTriples import nt_term, nt_to_term
+import numpy as np
+import json
+import mmap
+import os.path as op
+import struct
+
+MAGIC = b'SDMHDT1\n'
+# Terms per front-coded dictionary block
+BLOCK = 16
+
+
+def write_hdt(path, table, namespaces=None):
+    # Dictionary ids follow the byte order of the terms, so a term's id is
+    # found by binary search over the block heads
+    s, p, o = table.spo
+    encoded = [term.encode('utf-8') for term in table.terms]
+    used = np.unique(np.concatenate((s, p, o))).tolist()
+    used.sort(key=encoded.__getitem__)
+    ids = np.zeros(len(encoded), dtype=np.int64)
+    ids[used] = np.arange(len(used))
+    rows = np.unique(np.column_stack((ids[s], ids[p], ids[o])), axis=0)
+    s, p, o = rows[:, 0], rows[:, 1], rows[:, 2]
+    width = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64)
+                 if len(used) <= np.iinfo(dtype).max)
+
+    # One predicate entry per distinct (s, p) pair, one subject entry per
+    # distinct s. A set bit closes the list it belongs to
+    pairs = np.flatnonzero(np.diff(s, prepend=-1) | np.diff(p, prepend=-1))
+    pair_subjects = s[pairs]
+    firsts = np.flatnonzero(np.diff(pair_subjects, prepend=-1))
+    sections = {
+        'dictionary': None, 'blocks': None,
+        'subjects': pair_subjects[firsts].astype(width),
+        'Sp': p[pairs].astype(width),
+        'Bp': np.packbits(closing(firsts, len(pairs))),
+        'So': o.astype(width),
+        'Bo': np.packbits(closing(pairs, len(o))),
+    }
+    sections['dictionary'], sections['blocks'] = front_code([encoded[id] for id in used])
+
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        layout[name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps({'terms': len(used), 'triples': len(o), 'block': BLOCK,
+                         'counts': {'Bp': len(pairs), 'Bo': len(o)},
+                         'namespaces': namespaces or {}, 'sections': layout}).encode()
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+    with open(path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for array in sections.values():
+            file.write(array.tobytes())
+            file.write(b'\0' * (-array.nbytes % 8))
+
+
+def closing(starts, length):
+    # Bitmap with a bit set on the last element of every list, given the
+    # start positions of the lists
+    bits = np.zeros(length, dtype=bool)
+    if length:
+        bits[np.append(starts[1:] - 1, length - 1)] = True
+    return bits
+
+
+def front_code(terms):
+    # Blocks of BLOCK sorted terms: the first one whole, the others as the
+    # length of the prefix shared with their predecessor and the rest
+    data, blocks = bytearray(), []
+    for i, term in enumerate(terms):
+        if i % BLOCK == 0:
+            blocks.append(len(data))
+            data += varint(len(term)) + term
+        else:
+            previous = terms[i - 1]
+            shared = 0
+            limit = min(len(term), len(previous))
+            while shared < limit and term[shared] == previous[shared]:
+                shared += 1
+            data += varint(shared) + varint(len(term) - shared) + term[shared:]
+    return np.frombuffer(bytes(data), dtype=np.uint8), np.array(blocks, dtype=np.uint64)
+
+
+def varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def read_varint(data, position):
+    value, shift = 0, 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class HDTFile():
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'Not an HDT file: {path}')
+        length, = struct.unpack_from('<Q', self.map, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self.map[start:start + length])
+        base = start + length
+        self.sections = {name: np.frombuffer(self.map, dtype=dtype, count=count, offset=base + offset)
+                         for name, (offset, dtype, count) in self.header['sections'].items()}
+        offset, _, count = self.header['sections']['dictionary']
+        self.dictionary = memoryview(self.map)[base + offset:base + offset + count]
+        self.terms = {}
+        self.selects = None
+
+    def __len__(self):
+        return self.header['triples']
+
+    def close(self):
+        # Views into the map must go before it can be closed
+        self.dictionary.release()
+        self.sections = self.selects = self.dictionary = None
+        self.map.close()
+        self.file.close()
+
+    ########### Dictionary ###########
+    def block_head(self, block):
+        position = int(self.sections['blocks'][block])
+        length, position = read_varint(self.dictionary, position)
+        return bytes(self.dictionary[position:position + length]), position + length
+
+    def decode_block(self, block):
+        # All terms of a block as bytes
+        term, position = self.block_head(block)
+        terms = [term]
+        count = min(BLOCK, self.header['terms'] - block * BLOCK)
+        for _ in range(count - 1):
+            shared, position = read_varint(self.dictionary, position)
+            length, position = read_varint(self.dictionary, position)
+            term = term[:shared] + bytes(self.dictionary[position:position + length])
+            position += length
+            terms.append(term)
+        return terms
+
+    def term(self, id):
+        # rdflib term of a term id. Decoding a block caches all its terms
+        term = self.terms.get(id)
+        if term is None:
+            first = id - id % BLOCK
+            for offset, text in enumerate(self.decode_block(id // BLOCK)):
+                self.terms[first + offset] = nt_to_term(text.decode('utf-8'))
+            term = self.terms[id]
+        return term
+
+    def id(self, text):
+        # Term id of an N-Triples term, or None
+        key = text.encode('utf-8')
+        low, high = 0, len(self.sections['blocks'])
+        while low < high:
+            middle = (low + high) // 2
+            if self.block_head(middle)[0] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        block = low - 1
+        for offset, term in enumerate(self.decode_block(block)):
+            if term == key:
+                return block * BLOCK + offset
+        return None
+
+    ########### Triples ###########
+    def select(self):
+        # Positions of the set bits, i.e. where every list ends
+        if self.selects is None:
+            counts = self.header['counts']
+            self.selects = tuple(np.flatnonzero(np.unpackbits(self.sections[name], count=counts[name]))
+                                 for name in ('Bp', 'Bo'))
+        return self.selects
+
+    def match(self, s=None, p=None, o=None):
+        # Id columns of the triples matching a pattern of ids (None unbound)
+        subjects, Sp, So = (self.sections[name] for name in ('subjects', 'Sp', 'So'))
+        p_ends, o_ends = self.select()
+        if s is None and p is None:
+            positions = np.arange(len(So)) if o is None else np.flatnonzero(So == o)
+            pairs = np.searchsorted(o_ends, positions)
+        else:
+            if s is None:
+                pairs = np.flatnonzero(Sp == p)
+            else:
+                i = np.searchsorted(subjects, s)
+                if i == len(subjects) or subjects[i] != s:
+                    return (np.empty(0, dtype=np.int64),) * 3
+                pairs = np.arange(p_ends[i - 1] + 1 if i else 0, p_ends[i] + 1)
+                if p is not None:
+                    pairs = pairs[Sp[pairs] == p]
+            starts = np.where(pairs > 0, o_ends[pairs - 1] + 1, 0)
+            counts = o_ends[pairs] - starts + 1
+            pairs = np.repeat(pairs, counts)
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(len(pairs))
+            if o is not None:
+                keep = So[positions] == o
+                pairs, positions = pairs[keep], positions[keep]
+        return subjects[np.searchsorted(p_ends, pairs)], Sp[pairs], So[positions]
+
+    def triples(self, pattern=(None, None, None)):
+        # rdflib terms of the triples matching a pattern of rdflib terms
+        ids = []
+        for term in pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            id = self.id(nt_term(term))
+            if id is None:
+                return
+            ids.append(id)
+        term = self.term
+        for s, p, o in zip(*(column.tolist() for column in self.match(*ids))):
+            yield term(s), term(p), term(o)
+
+
+class HDTStore(Store):
+    # Read-only rdflib store over an HDT file: Graph('HDT').open(path)
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        self.hdt = None
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration, create=False):
+        if not op.exists(configuration):
+            return NO_STORE
+        self.hdt = HDTFile(configuration)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=False):
+        if self.hdt is not None:
+            self.hdt.close()
+            self.hdt = None
+
+    def triples(self, triple, context=None):
+        for match in self.hdt.triples(triple):
+            yield match, iter([context])
+
+    def __len__(self, context=None):
+        return len(self.hdt)
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def namespace(self, prefix):
+        uri = self.hdt.header['namespaces'].get(prefix)
+        return URIRef(uri) if uri is not None else None
+
+    def prefix(self, namespace):
+        for prefix, uri in self.hdt.header['namespaces'].items():
+            if uri == str(namespace):
+                return prefix
+        return None
+
+    def namespaces(self):
+        for prefix, uri in self.hdt.header['namespaces'].items():
+            yield prefix, URIRef(uri)
@@ -0,0 +1,187 @@
+# SDM Project 2. Knowledge Graphs
+# Incremental RDFS reasoner: keeps the explicit triples and, for every
+# inferred triple, the number of derivations supporting it. With the TBOX
+# hierarchies fixed, each consequence follows from a single explicit triple,
+# so a changeset is maintained by counting the consequences of the added and
+# removed triples only: a triple appears when its support goes from zero to
+# positive and disappears when it drops back to zero
+from generators.TripleTable import TripleTable
+from generators.RDFSMaterializer import (load, rdfs_vocabulary, schema, schema_triples,
+                                         consequences, literal_mask)
+import numpy as np
+import os
+import os.path as op
+
+# Rows are compared as (s, p, o) records so that sort and searchsorted order
+# them lexicographically
+ROW = np.dtype([('s', '<i8'), ('p', '<i8'), ('o', '<i8')])
+SCHEMA = ('subClassOf', 'subPropertyOf', 'domain', 'range')
+
+
+class IncrementalReasoner():
+
+    output_dir = op.join(os.getcwd(), 'output')
+    default_state_path = op.join(output_dir, 'reasoner')
+
+    def __init__(self, state_path=default_state_path):
+        self.state_path = state_path
+        self.table = TripleTable()
+        self.explicit = np.empty(0, dtype=ROW)
+        self.support = np.empty(0, dtype=ROW)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.is_literal = np.empty(0, dtype=bool)
+        self.hierarchy = None
+        if op.exists(op.join(state_path, 'explicit.npz')):
+            self.load()
+
+    ########### Entry points ###########
+    def materialize(self, tbox_path, abox_path, inferred_path):
+        # Full inferred file plus the changeset next to it
+        print('Updating RDFS closure...')
+        appeared, disappeared = self.sync(tbox_path, abox_path)
+        base = inferred_path[:-len('.nt')] if inferred_path.endswith('.nt') else inferred_path
+        self.write(inferred_path, self.inferred())
+        self.write(base + '.added.nt', appeared)
+        self.write(base + '.removed.nt', disappeared)
+        self.save()
+        print('RDFS closure updated!')
+
+    def sync(self, tbox_path, abox_path):
+        # Brings the state in line with the given TBOX + ABOX and returns
+        # the inferred triples that appeared and disappeared. Only the
+        # difference with the stored explicit triples is reasoned over
+        current = TripleTable()
+        current.terms, current.ids = self.table.terms, self.table.ids
+        load(current, tbox_path)
+        load(current, abox_path)
+        rows = np.unique(rows_of(*current.spo))
+        if not len(self.explicit):
+            return self.rebuild(rows)
+        added = rows[~contains(self.explicit, rows)]
+        removed = self.explicit[~contains(rows, self.explicit)]
+        print(f'{len(added)} explicit triples added, {len(removed)} removed')
+        return self.update(added, removed)
+
+    def update(self, added, removed):
+        # added/removed: ROW records of explicit triples encoded with
+        # self.table. Schema changes invalidate every derivation, so they
+        # fall back to a full rebuild
+        vocabulary = rdfs_vocabulary(self.table)
+        schema_ids = [vocabulary[name] for name in SCHEMA]
+        added = np.unique(added)
+        added = added[~contains(self.explicit, added)]
+        removed = np.unique(removed)
+        removed = removed[contains(self.explicit, removed)]
+        if np.isin(added['p'], schema_ids).any() or np.isin(removed['p'], schema_ids).any():
+            print('Schema changed, rebuilding the closure...')
+            previous = self.inferred()
+            explicit = self.explicit[~contains(removed, self.explicit)]
+            current, _ = self.rebuild(np.concatenate((explicit, added)))
+            return current[~contains(previous, current)], previous[~contains(current, previous)]
+
+        self.hierarchy = self.hierarchy or schema(vocabulary, *columns_of(self.explicit))
+        gained = self.derive(added)
+        lost = self.derive(removed)
+        affected = np.unique(np.concatenate((gained, lost, added, removed)))
+        before = self.visible(affected)
+
+        self.explicit = np.sort(np.concatenate(
+            (self.explicit[~contains(removed, self.explicit)], added)))
+        self.count(gained, 1)
+        self.count(lost, -1)
+
+        after = self.visible(affected)
+        appeared, disappeared = affected[after & ~before], affected[before & ~after]
+        print(f'{len(appeared)} inferred triples appeared, {len(disappeared)} disappeared')
+        return appeared, disappeared
+
+    def rebuild(self, rows):
+        print('Deriving the full closure...')
+        self.explicit = np.unique(rows)
+        vocabulary = rdfs_vocabulary(self.table)
+        self.hierarchy = schema(vocabulary, *columns_of(self.explicit))
+        self.support = np.empty(0, dtype=ROW)
+        self.counts = np.empty(0, dtype=np.int64)
+        # The closed hierarchies have a single, constant derivation each
+        self.count(rows_of(*schema_triples(vocabulary, self.hierarchy)), 1)
+        self.count(self.derive(self.explicit), 1)
+        return self.inferred(), np.empty(0, dtype=ROW)
+
+    ########### Support counting ###########
+    def derive(self, rows):
+        s, p, o = columns_of(rows)
+        return rows_of(*consequences(rdfs_vocabulary(self.table), self.hierarchy,
+                                     self.literals(), s, p, o))
+
+    def count(self, rows, sign):
+        keys, counts = np.unique(rows, return_counts=True)
+        position = np.searchsorted(self.support, keys)
+        found = contains(self.support, keys)
+        self.counts[position[found]] += sign * counts[found]
+        if sign > 0:
+            self.support = np.insert(self.support, position[~found], keys[~found])
+            self.counts = np.insert(self.counts, position[~found], counts[~found])
+        else:
+            keep = self.counts > 0
+            self.support, self.counts = self.support[keep], self.counts[keep]
+
+    def visible(self, rows):
+        # Inferred: supported by some derivation and not stated explicitly
+        return contains(self.support, rows) & ~contains(self.explicit, rows)
+
+    def inferred(self):
+        return self.support[~contains(self.explicit, self.support)]
+
+    def literals(self):
+        # Literal flags per term id, extended as the dictionary grows
+        known = len(self.is_literal)
+        if known < len(self.table.terms):
+            extra = np.fromiter((term[0] == '"' for term in self.table.terms[known:]),
+                                dtype=bool, count=len(self.table.terms) - known)
+            self.is_literal = np.concatenate((self.is_literal, extra))
+        return self.is_literal
+
+    ########### Persistence ###########
+    def load(self):
+        self.table = TripleTable.load(op.join(self.state_path, 'explicit.npz'))
+        self.explicit = rows_of(*self.table.spo)
+        with np.load(op.join(self.state_path, 'support.npz')) as data:
+            self.support = rows_of(data['s'], data['p'], data['o'])
+            self.counts = data['counts']
+        self.is_literal = literal_mask(self.table)
+        self.hierarchy = None
+
+    def save(self):
+        os.makedirs(self.state_path, exist_ok=True)
+        state = TripleTable()
+        state.terms = self.table.terms
+        state.add_ids(*columns_of(self.explicit))
+        state.save(op.join(self.state_path, 'explicit.npz'))
+        s, p, o = columns_of(self.support)
+        np.savez(op.join(self.state_path, 'support.npz'), s=s, p=p, o=o, counts=self.counts)
+
+    def write(self, path, rows):
+        # Rows are already sorted and distinct
+        table = TripleTable()
+        table.terms = self.table.terms
+        table._s, table._p, table._o = columns_of(rows)
+        with open(path, 'w', encoding='utf-8', newline='\n') as file:
+            table.write_ntriples(file)
+
+
+def rows_of(s, p, o):
+    rows = np.empty(len(s), dtype=ROW)
+    rows['s'], rows['p'], rows['o'] = s, p, o
+    return rows
+
+
+def columns_of(rows):
+    return rows['s'], rows['p'], rows['o']
+
+
+def contains(sorted_rows, rows):
+    # Membership of rows in a sorted, distinct record array
+    position = np.searchsorted(sorted_rows, rows)
+    found = position < len(sorted_rows)
+    found[found] = sorted_rows[position[found]] == rows[found]
+    return found
@@ -0,0 +1,128 @@
+# SDM Project 2. Knowledge Graphs
+# Per-stage instrumentation of the generators. Every stage (a TBOX section, an
+# ABOX node or edge stage, serialization, ...) reports a start record and an
+# end record with its wall time, rows read, triples written, RSS and, on
+# request, its tracemalloc peak and a cProfile dump. Records are dicts handed
+# to a sink: any callable, e.g. a JSONLinesSink or list.append. Without
+# instrumentation the generators use NoInstrumentation, whose methods do
+# nothing
+from contextlib import contextmanager, nullcontext
+import cProfile
+import json
+import os
+import os.path as op
+import time
+import tracemalloc
+
+
+def rss():
+    # Current resident set size in bytes (Linux), else None
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+
+class JSONLinesSink():
+    # One JSON record per line, flushed as it is written so a running build
+    # can be followed with tail -f. The file is always appended to, so the
+    # whole lines written by worker processes, which reopen it, interleave
+    # with the main process' instead of being overwritten
+
+    def __init__(self, path, truncate=True):
+        self.path = path
+        if truncate:
+            open(path, 'w').close()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, record):
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'file': None}
+
+
+class Instrumentation():
+
+    def __init__(self, sink=print, profile_dir=None, trace=False):
+        self.sink = sink
+        self.profile_dir = profile_dir
+        self.trace = trace
+        # Open stages, innermost last. Counts go to the innermost one
+        self.spans = []
+
+    @contextmanager
+    def stage(self, component, name):
+        span = {'component': component, 'stage': name, 'pid': os.getpid(),
+                'rows': 0, 'triples': 0}
+        self.sink({'event': 'start', 'time': time.time(), **span})
+        self.spans.append(span)
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self.profile_dir else None
+        before = rss()
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield span
+        except BaseException as error:
+            span['error'] = repr(error)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            self.spans.pop()
+            after = rss()
+            span.update(event='end', time=time.time(), seconds=seconds,
+                        triples_per_second=span['triples'] / seconds if seconds else None,
+                        rss=after, rss_delta=after - before if before is not None else None)
+            if self.trace:
+                # Peak allocated on top of what was live when the stage began
+                span['traced_peak'] = tracemalloc.get_traced_memory()[1] - traced
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                span['profile'] = op.join(self.profile_dir, f'{component}.{name}.prof')
+                profiler.dump_stats(span['profile'])
+            self.sink(span)
+
+    def count_rows(self, n):
+        if self.spans:
+            self.spans[-1]['rows'] += int(n)
+
+    def count_triples(self, n):
+        if self.spans:
+            self.spans[-1]['triples'] += int(n)
+
+    def close(self):
+        close = getattr(self.sink, 'close', None)
+        if close is not None:
+            close()
+
+
+class NoInstrumentation():
+
+    def stage(self, component, name):
+        return nullcontext()
+
+    def count_rows(self, n):
+        pass
+
+    def count_triples(self, n):
+        pass
+
+    def close(self):
+        pass
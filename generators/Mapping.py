@@ -0,0 +1,171 @@
+# SDM Project 2. Knowledge Graphs
+# Declarative CSV -> RDF mapping. A Mapping lists the node types (the CSV a
+# node table is read from, its key, datatype properties and natural key)
+# and the relations (an object property between two nodes, joined from the
+# key columns of an edge CSV or a node table). Mapping.compile() turns it
+# into a Plan the ABOX generator executes: node tables built in dependency
+# order, one key -> URN index per keyed node type, and one stage per node
+# type or relation that reads only the columns the mapping uses, resolves
+# each key column once for all the properties it feeds, and asserts every
+# property of a batch of rows at once
+from dataclasses import dataclass
+from collections import namedtuple
+
+# Building a node table: read the CSV columns used, or take the distinct
+# keys of another node table, then remove the keys of the excluded node
+TableStep = namedtuple('TableStep', ['node', 'csv', 'columns', 'used', 'distinct', 'excludes'])
+# Key -> URN index over the tables of nodes, first URN of a key wins if unique
+Index = namedtuple('Index', ['name', 'key', 'nodes', 'unique'])
+# Key column of a batch resolved through an index into a URN column
+Lookup = namedtuple('Lookup', ['index', 'column', 'urn'])
+# One triple per row (with where, only rows whose column has the value)
+Emit = namedtuple('Emit', ['property', 'subject', 'object', 'where'])
+# A stage asserts one node type or relation. It reads its own edge CSVs
+# (csvs) and only depends on the URN tables it lists (tables). Node stages
+# have properties, edge stages read batches from a CSV (csv, columns, used)
+# or a node table (source) and run their lookups and emits on each
+Stage = namedtuple('Stage', ['name', 'csvs', 'tables', 'source', 'properties',
+                             'csv', 'columns', 'used', 'lookups', 'emits'])
+# Everything the generator runs, and the CSVs and natural keys of the tables
+Plan = namedtuple('Plan', ['tables', 'indexes', 'stages', 'table_csvs', 'urn_keys'])
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    # CSV relative to data/ and the names of its columns, in file order
+    csv: str = None
+    columns: tuple = ()
+    # Identifying columns, read even when no property uses them
+    ids: tuple = ()
+    properties: tuple = ()
+    # Column edges refer to the node by, and the nodes whose URNs that key
+    # resolves to (default: this one)
+    key: str = None
+    resolves: tuple = ()
+    unique: bool = False
+    # Natural key the 'hash' URN scheme mints from
+    urn_key: tuple = ()
+    # Without a CSV: the distinct keys of another node table
+    distinct: str = None
+    # Nodes whose keys are not nodes of this type
+    excludes: str = None
+
+
+@dataclass(frozen=True)
+class Ref:
+    # A node an edge row refers to by its key column. Without a column, the
+    # URN column of the node table the rows come from
+    node: str
+    column: str = None
+    # URN column name, when both ends are the same node type
+    urn: str = None
+
+
+@dataclass(frozen=True)
+class Relation:
+    # Relations with the same stage name share their rows and lookups
+    stage: str
+    property: str
+    subject: Ref
+    object: Ref
+    csv: str = None
+    columns: tuple = ()
+    ids: tuple = ()
+    # Node table the rows come from, instead of a CSV
+    table: str = None
+    # (column, value): only rows with that value
+    where: tuple = None
+
+
+@dataclass(frozen=True)
+class Mapping:
+    nodes: tuple
+    relations: tuple
+
+    def compile(self):
+        nodes = {node.name: node for node in self.nodes}
+        if len(nodes) != len(self.nodes):
+            raise ValueError('Node types must have distinct names')
+        groups = {}
+        for relation in self.relations:
+            groups.setdefault(relation.stage, []).append(relation)
+        for name, relations in groups.items():
+            for ref in [end for relation in relations for end in (relation.subject, relation.object)]:
+                if ref.node not in nodes:
+                    raise ValueError(f'Relation {name} refers to an unknown node type: {ref.node}')
+                if ref.column is not None and nodes[ref.node].key is None:
+                    raise ValueError(f'Relation {name} joins {ref.node}, which has no key')
+            if len({(relation.csv, relation.table) for relation in relations}) > 1:
+                raise ValueError(f'Relations of stage {name} must read the same rows')
+
+        # Columns every node table must keep: its own, and those its
+        # dependents and table-sourced relations read from it
+        used = {node.name: set(node.ids) | set(node.properties) | set(node.urn_key)
+                | ({node.key} if node.key else set()) for node in self.nodes}
+        for node in self.nodes:
+            for other in (node.distinct, node.excludes):
+                if other:
+                    used[other].add(node.key)
+        for relation in self.relations:
+            if relation.table:
+                used[relation.table].update(ref.column for ref in (relation.subject, relation.object)
+                                            if ref.column)
+                if relation.where:
+                    used[relation.table].add(relation.where[0])
+
+        # Tables in spec order, each after the tables it is derived from
+        steps, done = [], set()
+
+        def build(node):
+            if node.name in done:
+                return
+            done.add(node.name)
+            for other in (node.distinct, node.excludes):
+                if other:
+                    build(nodes[other])
+            read = [column for column in node.columns if column in used[node.name]]
+            steps.append(TableStep(node, node.csv, node.columns, read, node.distinct, node.excludes))
+
+        for node in self.nodes:
+            build(node)
+
+        # One index per node type with a key, over the tables it resolves to
+        indexes = [Index(node.name + '_index', node.key, node.resolves or (node.name,), node.unique)
+                   for node in self.nodes if node.key]
+
+        stages = [Stage(node.name, [], [node.name], node.name, node.properties,
+                        None, (), (), (), ()) for node in self.nodes if node.properties]
+        for name, relations in groups.items():
+            first = relations[0]
+            lookups = []
+            for ref in [end for relation in relations for end in (relation.subject, relation.object)]:
+                lookup = Lookup(ref.node + '_index', ref.column, ref.urn or ref.node)
+                if ref.column and lookup not in lookups:
+                    lookups.append(lookup)
+            # Lookups through unique indexes are plain hash probes that only
+            # drop rows, so they go first and the lookups that may repeat
+            # rows run on what is left
+            unique = {index.name for index in indexes if index.unique}
+            lookups.sort(key=lambda lookup: lookup.index not in unique)
+            emits = tuple(Emit(relation.property, relation.subject.urn or relation.subject.node,
+                               relation.object.urn or relation.object.node, relation.where)
+                          for relation in relations)
+            tables = [first.table] if first.table else []
+            for lookup in lookups:
+                if lookup.index not in tables:
+                    tables.append(lookup.index)
+            read = ()
+            if first.csv:
+                needed = {lookup.column for lookup in lookups} | set(first.ids)
+                needed |= {relation.where[0] for relation in relations if relation.where}
+                read = tuple(column for column in first.columns if column in needed)
+            stages.append(Stage(name, [first.csv] if first.csv else [], tables, first.table, (),
+                                first.csv, first.columns, read, tuple(lookups), emits))
+
+        table_csvs = []
+        for node in self.nodes:
+            if node.csv and node.csv not in table_csvs:
+                table_csvs.append(node.csv)
+        return Plan(steps, indexes, stages, table_csvs,
+                    {node.name: list(node.urn_key) for node in self.nodes})
@@ -0,0 +1,52 @@
+# SDM Project 2. Knowledge Graphs
+# N-Triples term syntax, shared by the streaming writers and the encoded
+# triple table
+from rdflib import BNode, Literal, URIRef
+import re
+
+ESCAPES = {'\\': '\\', '"': '"', 'n': '\n', 'r': '\r', 't': '\t',
+           'b': '\b', 'f': '\f'}
+ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+
+
+def nt_term(term):
+    if isinstance(term, Literal):
+        lexical = str(term).replace('\\', '\\\\').replace('"', '\\"')\
+            .replace('\n', '\\n').replace('\r', '\\r')
+        if term.language:
+            return f'"{lexical}"@{term.language}'
+        if term.datatype:
+            return f'"{lexical}"^^<{term.datatype}>'
+        return f'"{lexical}"'
+    if isinstance(term, BNode):
+        return f'_:{term}'
+    return f'<{term}>'
+
+
+def nt_to_term(text):
+    if text[0] == '<':
+        return URIRef(text[1:-1])
+    if text[0] == '_':
+        return BNode(text[2:])
+    end = text.rindex('"')
+    lexical = ESCAPE.sub(unescape, text[1:end])
+    suffix = text[end + 1:]
+    if suffix.startswith('^^'):
+        return Literal(lexical, datatype=URIRef(suffix[3:-1]))
+    if suffix.startswith('@'):
+        return Literal(lexical, lang=suffix[1:])
+    return Literal(lexical)
+
+
+def unescape(match):
+    escape = match.group(1)
+    if len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return ESCAPES.get(escape, escape)
+
+
+def split_line(line):
+    # Subject, predicate and object of an N-Triples line. Subjects and
+    # predicates never contain spaces, objects may (literals)
+    subject, predicate, rest = line.split(' ', 2)
+    return subject, predicate, rest.rstrip()[:-1].rstrip()
@@ -0,0 +1,184 @@
+# SDM Project 2. Knowledge Graphs
+# RDFS materializer: computes the RDFS (Optimized) closure of TBOX + ABOX
+# once, in bulk, with sort-merge joins over the integer-encoded triples,
+# and writes the inferred triples to N-Triples
+from rdflib import Graph
+from rdflib.namespace import RDF, RDFS
+from generators.TripleTable import TripleTable
+from generators.NTriples import nt_term
+from generators.HDTFile import HDTFile
+import numpy as np
+import gzip
+import os
+import os.path as op
+
+
+class RDFSMaterializer():
+
+    output_dir = op.join(os.getcwd(), 'output')
+    default_tbox_path = op.join(output_dir, 'TBOX.ttl')
+    default_abox_path = op.join(output_dir, 'ABOX.ttl')
+    default_inferred_path = op.join(output_dir, 'INFERRED.nt')
+
+    def __init__(self, tbox_path=default_tbox_path, abox_path=default_abox_path, inferred_path=default_inferred_path):
+
+        print('Materializing RDFS closure...')
+        self.table = TripleTable()
+        load(self.table, tbox_path)
+        load(self.table, abox_path)
+
+        s, p, o = self.table.spo
+        inferred = self.closure(s, p, o)
+        print(f'{len(inferred[0])} triples inferred!')
+
+        print('Serializing inferred triples...')
+        self.inferred = TripleTable()
+        self.inferred.terms, self.inferred.ids = self.table.terms, self.table.ids
+        self.inferred.add_ids(*inferred)
+        self.inferred.sort()
+        with open(inferred_path, 'w', encoding='utf-8', newline='\n') as file:
+            self.inferred.write_ntriples(file)
+        print('RDFS closure materialized!')
+
+    def closure(self, s, p, o):
+        vocabulary = rdfs_vocabulary(self.table)
+        hierarchy = schema(vocabulary, s, p, o)
+        derived = [schema_triples(vocabulary, hierarchy),
+                   consequences(vocabulary, hierarchy, literal_mask(self.table), s, p, o)]
+        return difference(tuple(np.concatenate([d[k] for d in derived]) for k in range(3)),
+                          (s, p, o))
+
+
+def rdfs_vocabulary(table):
+    # Ids of the RDF/RDFS terms the rules join on
+    return {name: table.intern(nt_term(term)) for name, term in (
+        ('type', RDF.type), ('subClassOf', RDFS.subClassOf),
+        ('subPropertyOf', RDFS.subPropertyOf), ('domain', RDFS.domain),
+        ('range', RDFS.range))}
+
+
+def schema(vocabulary, s, p, o):
+    # rdfs5/rdfs11: transitive subPropertyOf and subClassOf, plus the
+    # domain and range declarations
+    def pairs(property):
+        return s[p == vocabulary[property]], o[p == vocabulary[property]]
+    return {'subPropertyOf': transitive_closure(*pairs('subPropertyOf')),
+            'subClassOf': transitive_closure(*pairs('subClassOf')),
+            'domain': pairs('domain'), 'range': pairs('range')}
+
+
+def schema_triples(vocabulary, hierarchy):
+    # The closed hierarchies themselves
+    properties, classes = hierarchy['subPropertyOf'], hierarchy['subClassOf']
+    return (np.concatenate((properties[0], classes[0])),
+            np.concatenate((np.full(len(properties[0]), vocabulary['subPropertyOf']),
+                            np.full(len(classes[0]), vocabulary['subClassOf']))),
+            np.concatenate((properties[1], classes[1])))
+
+
+def consequences(vocabulary, hierarchy, is_literal, s, p, o):
+    # Everything the instance rules derive from the given triples, one row
+    # per derivation (so with repetitions). With the hierarchies already
+    # closed, every consequence follows from a single given triple
+    properties, classes = hierarchy['subPropertyOf'], hierarchy['subClassOf']
+    domains, ranges = hierarchy['domain'], hierarchy['range']
+    rdf_type = vocabulary['type']
+
+    # rdfs7: every triple also holds for the super-properties of its
+    # property
+    i, j = join(p, properties[0])
+    expanded = s[i], properties[1][j], o[i]
+    all_s = np.concatenate((s, expanded[0]))
+    all_p = np.concatenate((p, expanded[1]))
+    all_o = np.concatenate((o, expanded[2]))
+
+    # rdfs2/rdfs3: subjects are typed by the domains of their properties
+    # and resource objects by the ranges
+    i, j = join(all_p, domains[0])
+    typed_s, typed_o = [all_s[i]], [domains[1][j]]
+    resources = ~is_literal[all_o]
+    i, j = join(all_p[resources], ranges[0])
+    typed_s.append(all_o[resources][i])
+    typed_o.append(ranges[1][j])
+    is_type = all_p == rdf_type
+    typed_s.append(all_s[is_type])
+    typed_o.append(all_o[is_type])
+    typed_s, typed_o = np.concatenate(typed_s), np.concatenate(typed_o)
+    derived = len(typed_s) - int(is_type.sum())
+
+    # rdfs9: types propagate up the class hierarchy
+    i, j = join(typed_o, classes[0])
+    typed_s = np.concatenate((typed_s[:derived], typed_s[i]))
+    typed_o = np.concatenate((typed_o[:derived], classes[1][j]))
+
+    return (np.concatenate((expanded[0], typed_s)),
+            np.concatenate((expanded[1], np.full(len(typed_s), rdf_type))),
+            np.concatenate((expanded[2], typed_o)))
+
+
+def literal_mask(table):
+    return np.fromiter((term[0] == '"' for term in table.terms),
+                       dtype=bool, count=len(table.terms))
+
+
+def load(table, path):
+    # N-Triples files are read line by line straight into the table, other
+    # formats go through an rdflib parse
+    if path.endswith('.nt') or path.endswith('.nt.gz'):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as file:
+            table.add_ntriples(file)
+    elif path.endswith('.hdt'):
+        hdt = HDTFile(path)
+        table.add(hdt.triples())
+        hdt.close()
+    elif path.endswith('.sqlite'):
+        g = Graph('SQLite')
+        g.open(path)
+        table.add(g)
+        g.close()
+    else:
+        g = Graph()
+        g.parse(path)
+        table.add(g)
+
+
+def join(left, right):
+    # Index pairs (i, j) with left[i] == right[j], as a sort-merge join
+    order = np.argsort(right, kind='stable')
+    sorted_right = right[order]
+    start = np.searchsorted(sorted_right, left, 'left')
+    counts = np.searchsorted(sorted_right, left, 'right') - start
+    i = np.repeat(np.arange(len(left)), counts)
+    offsets = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(start, counts) + offsets]
+    return i, j
+
+
+def transitive_closure(sub, sup):
+    # All (sub, sup) pairs reachable through the hierarchy, by repeated
+    # self-joins until no new pair appears
+    pairs = unique((sub, sup))
+    while True:
+        i, j = join(pairs[1], pairs[0])
+        extended = unique((np.concatenate((pairs[0], pairs[0][i])),
+                           np.concatenate((pairs[1], pairs[1][j]))))
+        if len(extended[0]) == len(pairs[0]):
+            return pairs
+        pairs = extended
+
+
+def unique(columns):
+    rows = np.unique(np.column_stack(columns), axis=0)
+    return tuple(rows[:, k] for k in range(len(columns)))
+
+
+def difference(columns, existing):
+    # Distinct rows of columns that are not rows of existing
+    rows = np.column_stack(columns).astype(np.int64)
+    known = np.column_stack(existing).astype(np.int64)
+    distinct, first, inverse = np.unique(np.concatenate((rows, known)), axis=0,
+                                         return_index=True, return_inverse=True)
+    new = ~np.isin(np.arange(len(distinct)), inverse.ravel()[len(rows):])
+    new &= first < len(rows)
+    return tuple(distinct[new, k] for k in range(distinct.shape[1]))
@@ -0,0 +1,158 @@
+# SDM Project 2. Knowledge Graphs
+# Persistent rdflib store on a single SQLite file. Terms are interned in a
+# dictionary table and triples are stored as integer ids with SPO, POS and
+# OSP indexes, so a query process opens the graph in milliseconds and only
+# pages in the parts of the file its triple patterns touch
+from rdflib import BNode, Literal, URIRef
+from rdflib.store import Store, VALID_STORE, NO_STORE
+import os.path as op
+import sqlite3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    language TEXT NOT NULL,
+    UNIQUE (kind, value, datatype, language));
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pos ON triples (p, o, s);
+CREATE INDEX IF NOT EXISTS osp ON triples (o, s, p);
+CREATE TABLE IF NOT EXISTS namespaces (
+    prefix TEXT PRIMARY KEY,
+    uri TEXT NOT NULL);
+'''
+
+
+class SQLiteStore(Store):
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        self.connection = None
+        # Both directions of the term dictionary, filled lazily
+        self.ids = {}
+        self.terms = {}
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration, create=False):
+        if not create and not op.exists(configuration):
+            return NO_STORE
+        self.connection = sqlite3.connect(configuration)
+        self.connection.executescript(SCHEMA)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=False):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def commit(self):
+        self.connection.commit()
+
+    ########### Term dictionary ###########
+    def term_key(self, term):
+        if isinstance(term, Literal):
+            return ('L', str(term), str(term.datatype or ''), term.language or '')
+        if isinstance(term, BNode):
+            return ('B', str(term), '', '')
+        return ('U', str(term), '', '')
+
+    def term_id(self, term, create=False):
+        key = self.term_key(term)
+        id = self.ids.get(key)
+        if id is None:
+            row = self.connection.execute(
+                'SELECT id FROM terms WHERE kind=? AND value=? AND datatype=? AND language=?', key).fetchone()
+            if row is not None:
+                id = row[0]
+            elif create:
+                id = self.connection.execute(
+                    'INSERT INTO terms (kind, value, datatype, language) VALUES (?, ?, ?, ?)', key).lastrowid
+            else:
+                return None
+            self.ids[key] = id
+        return id
+
+    def term(self, id):
+        term = self.terms.get(id)
+        if term is None:
+            kind, value, datatype, language = self.connection.execute(
+                'SELECT kind, value, datatype, language FROM terms WHERE id=?', (id,)).fetchone()
+            if kind == 'L':
+                term = Literal(value, lang=language or None,
+                               datatype=datatype or None)
+            elif kind == 'B':
+                term = BNode(value)
+            else:
+                term = URIRef(value)
+            self.terms[id] = term
+        return term
+
+    ########### Triples ###########
+    def add(self, triple, context=None, quoted=False):
+        self.addN([(*triple, context)])
+
+    def addN(self, quads):
+        rows = ((self.term_id(s, True), self.term_id(p, True), self.term_id(o, True))
+                for s, p, o, _ in quads)
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)', rows)
+
+    def remove(self, triple, context=None):
+        where, params = self.pattern(triple)
+        if where is not None:
+            self.connection.execute('DELETE FROM triples' + where, params)
+
+    def triples(self, triple, context=None):
+        where, params = self.pattern(triple)
+        if where is None:
+            return
+        for s, p, o in self.connection.execute('SELECT s, p, o FROM triples' + where, params):
+            yield (self.term(s), self.term(p), self.term(o)), iter([context])
+
+    def pattern(self, triple):
+        # WHERE clause for the bound positions of a triple pattern, or None
+        # when a bound term is not in the dictionary (nothing can match)
+        conditions, params = [], []
+        for column, term in zip('spo', triple):
+            if term is None:
+                continue
+            id = self.term_id(term)
+            if id is None:
+                return None, None
+            conditions.append(column + '=?')
+            params.append(id)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def __len__(self, context=None):
+        return self.connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    ########### Namespaces ###########
+    def bind(self, prefix, namespace, override=True):
+        if override or self.namespace(prefix) is None:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO namespaces (prefix, uri) VALUES (?, ?)', (prefix, str(namespace)))
+
+    def namespace(self, prefix):
+        row = self.connection.execute(
+            'SELECT uri FROM namespaces WHERE prefix=?', (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.connection.execute(
+            'SELECT prefix FROM namespaces WHERE uri=?', (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self.connection.execute('SELECT prefix, uri FROM namespaces'):
+            yield prefix, URIRef(uri)
@@ -2,6 +2,8 @@
 # TBOX generator
 from rdflib import Graph, Namespace
 from rdflib.namespace import RDF, RDFS, XSD
+from generators.TripleSink import StoreSink, EncodedSink
+from generators.Instrumentation import NoInstrumentation
 import os
 import os.path as op
 
@@ -10,8 +12,10 @@ class TBOXGenerator():
 
     default_ttl_path = op.join(os.getcwd(), 'output', 'TBOX.ttl')
 
-    def __init__(self, baseURL='http://SDM.org/Lab2/', ttl_path=default_ttl_path):
+    def __init__(self, baseURL='http://SDM.org/Lab2/', ttl_path=default_ttl_path, store_path=None,
+                 format='turtle', hdt_path=None, instrument=None):
         n = Namespace(baseURL)
+        self.instrument = instrument or NoInstrumentation()
         self.g = Graph()
         self.g.bind('', n)
 
@@ -19,88 +23,116 @@ class TBOXGenerator():
 
         # Classes
         print('Asserting DatatypeProperties and subclasses...')
-        author = n.author
-        reviewer = n.reviewer
-        self.create_property(n.name_author, author, XSD.string)
-        self.g.add((reviewer, RDFS.subClassOf, author))
-
-        paper = n.paper
-        self.create_property(n.pages, paper, XSD.integer)
-        self.create_property(n.DOI, paper, XSD.string)
-        self.create_property(n.abstract, paper, XSD.string)
-        self.create_property(n.name_paper, paper, XSD.string)
-
-        review = n.review
-        self.create_property(n.approves, paper, XSD.string)
-        self.create_property(n.content, paper, XSD.string)
-
-        affiliation = n.affiliation
-        self.create_property(n.name_affiliation, affiliation, XSD.string)
-        self.create_property(n.type, affiliation, XSD.string)
-
-        keyword = n.keyword
-        self.create_property(n.name_keyword, keyword, XSD.string)
-
-        venue = n.venue
-        self.create_property(n.name_venue, venue, XSD.string)
-        journal = n.journal
-        self.g.add((journal, RDFS.subClassOf, venue))
-        conference = n.conference
-        self.g.add((conference, RDFS.subClassOf, venue))
-
-        compilation = n.compilation
-        self.create_property(n.name_compilation, compilation, XSD.string)
-        self.create_property(n.year, compilation, XSD.integer)
-        volume = n.volume
-        self.g.add((volume, RDFS.subClassOf, compilation))
-        edition = n.edition
-        self.create_property(n.location, edition, XSD.string)
-        self.g.add((edition, RDFS.subClassOf, compilation))
-
-        community = n.community
-        self.create_property(n.name_community, community, XSD.string)
+        with self.instrument.stage('TBOX', 'datatype_properties'):
+            author = n.author
+            reviewer = n.reviewer
+            self.create_property(n.name_author, author, XSD.string)
+            self.g.add((reviewer, RDFS.subClassOf, author))
+            # Citation metrics of the author's papers (main.py --metrics)
+            self.create_property(n.total_citations, author, XSD.integer)
+            self.create_property(n.h_index, author, XSD.integer)
+
+            paper = n.paper
+            self.create_property(n.pages, paper, XSD.integer)
+            self.create_property(n.DOI, paper, XSD.string)
+            self.create_property(n.abstract, paper, XSD.string)
+            self.create_property(n.name_paper, paper, XSD.string)
+            # Citation metrics (main.py --metrics)
+            self.create_property(n.citation_count, paper, XSD.integer)
+            self.create_property(n.pagerank, paper, XSD.double)
+
+            review = n.review
+            self.create_property(n.approves, paper, XSD.string)
+            self.create_property(n.content, paper, XSD.string)
+
+            affiliation = n.affiliation
+            self.create_property(n.name_affiliation, affiliation, XSD.string)
+            self.create_property(n.type, affiliation, XSD.string)
+
+            keyword = n.keyword
+            self.create_property(n.name_keyword, keyword, XSD.string)
+
+            venue = n.venue
+            self.create_property(n.name_venue, venue, XSD.string)
+            journal = n.journal
+            self.g.add((journal, RDFS.subClassOf, venue))
+            conference = n.conference
+            self.g.add((conference, RDFS.subClassOf, venue))
+
+            compilation = n.compilation
+            self.create_property(n.name_compilation, compilation, XSD.string)
+            self.create_property(n.year, compilation, XSD.integer)
+            volume = n.volume
+            self.g.add((volume, RDFS.subClassOf, compilation))
+            edition = n.edition
+            self.create_property(n.location, edition, XSD.string)
+            self.g.add((edition, RDFS.subClassOf, compilation))
+
+            community = n.community
+            self.create_property(n.name_community, community, XSD.string)
+            self.instrument.count_triples(len(self.g))
         print('DatatypeProperties and subclasses asserted!')
 
         # Object Properties
         print('Asserting ObjectProperties...')
-        self.create_property(n.writes, author, paper)
-        self.create_subproperty(
-            n.is_corresponding_author, n.writes, author, paper)
+        with self.instrument.stage('TBOX', 'object_properties'):
+            before = len(self.g)
+            self.create_property(n.writes, author, paper)
+            self.create_subproperty(
+                n.is_corresponding_author, n.writes, author, paper)
 
-        self.create_property(n.writes_r, reviewer, review)
+            self.create_property(n.writes_r, reviewer, review)
 
-        self.create_property(n.about, review, paper)
+            self.create_property(n.about, review, paper)
 
-        self.create_property(n.belongs_to_a, author, affiliation)
+            self.create_property(n.belongs_to_a, author, affiliation)
 
-        self.create_property(n.relates_to, paper, keyword)
+            self.create_property(n.relates_to, paper, keyword)
 
-        self.create_property(n.cites, paper, paper)
+            self.create_property(n.cites, paper, paper)
 
-        self.create_property(n.published_in_c, paper, compilation)
-        self.create_subproperty(
-            n.published_in_v, n.published_in_c, paper, volume)
-        self.create_subproperty(
-            n.published_in_e, n.published_in_c, paper, edition)
+            self.create_property(n.published_in_c, paper, compilation)
+            self.create_subproperty(
+                n.published_in_v, n.published_in_c, paper, volume)
+            self.create_subproperty(
+                n.published_in_e, n.published_in_c, paper, edition)
 
-        self.create_property(n.belongs_to_v, compilation, venue)
-        self.create_subproperty(
-            n.belongs_to_j, n.belongs_to_v, volume, journal)
-        self.create_subproperty(
-            n.belongs_to_c, n.belongs_to_v, edition, conference)
-        
-        self.create_property(n.v_in, venue, community)
-        self.create_subproperty(n.j_in, n.v_in, journal, community)
-        self.create_subproperty(n.c_in, n.v_in, conference, community)
-        
+            self.create_property(n.belongs_to_v, compilation, venue)
+            self.create_subproperty(
+                n.belongs_to_j, n.belongs_to_v, volume, journal)
+            self.create_subproperty(
+                n.belongs_to_c, n.belongs_to_v, edition, conference)
 
+            self.create_property(n.v_in, venue, community)
+            self.create_subproperty(n.j_in, n.v_in, journal, community)
+            self.create_subproperty(n.c_in, n.v_in, conference, community)
+            self.instrument.count_triples(len(self.g) - before)
         print('ObjectProperties asserted!')
 
         # Generate .ttl
         print('Serializing TBOX...')
-        self.g.serialize(destination=ttl_path)
+        with self.instrument.stage('TBOX', 'serialize'):
+            if format == 'fast-turtle':
+                sink = EncodedSink(ttl_path, n, format)
+                sink.add(self.g)
+                sink.close()
+            else:
+                self.g.serialize(destination=ttl_path)
+            self.instrument.count_triples(len(self.g))
         print('TBOX serialized!')
 
+        # Also load the TBOX into a persistent triple store
+        if store_path:
+            sink = StoreSink(store_path, n)
+            sink.add(self.g)
+            sink.close()
+
+        # And as a binary HDT-style file
+        if hdt_path:
+            sink = EncodedSink(hdt_path, n, 'hdt')
+            sink.add(self.g)
+            sink.close()
+
         print('TBOX generated!')
         return None
 
@@ -0,0 +1,63 @@
+# SDM Project 2. Knowledge Graphs
+# Cache of the cleaned, URN-annotated input tables, keyed on the hashes of
+# their source CSVs. Tables are Arrow IPC (Feather) files when pyarrow is
+# installed, and pickles otherwise
+from pandas import read_pickle
+from generators.BuildManifest import file_hash, combine
+from importlib.util import find_spec
+import json
+import os
+import os.path as op
+
+ARROW = find_spec('pyarrow') is not None
+if ARROW:
+    from pyarrow import feather
+
+
+class TableCache():
+
+    default_path = op.join(os.getcwd(), 'output', 'cache')
+
+    def __init__(self, path=default_path):
+        self.path = path
+        self.extension = '.arrow' if ARROW else '.pkl'
+        self.manifest_path = op.join(path, 'manifest.json')
+        self.manifest = {}
+        if op.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.manifest = json.load(file)
+
+    def fingerprint(self, sources, *extra):
+        return combine(*extra, *[f'{op.basename(source)}:{file_hash(source)}'
+                                 for source in sources])
+
+    def load(self, fingerprint):
+        # All cached tables, or None when the cache is missing or stale
+        if self.manifest.get('fingerprint') != fingerprint\
+                or self.manifest.get('format') != self.extension:
+            return None
+        try:
+            return {name: self.read(name) for name in self.manifest['tables']}
+        except FileNotFoundError:
+            return None
+
+    def read(self, name):
+        # Also the entry point for ad-hoc analytics on a single table. Only
+        # the file read is memory-mapped: the columns are copied into pandas
+        path = op.join(self.path, name + self.extension)
+        if ARROW:
+            return feather.read_table(path, memory_map=True).to_pandas()
+        return read_pickle(path)
+
+    def save(self, tables, fingerprint):
+        os.makedirs(self.path, exist_ok=True)
+        for name, df in tables.items():
+            path = op.join(self.path, name + self.extension)
+            if ARROW:
+                df.to_feather(path)
+            else:
+                df.to_pickle(path)
+        self.manifest = {'fingerprint': fingerprint, 'format': self.extension,
+                         'tables': list(tables)}
+        with open(self.manifest_path, 'w') as file:
+            json.dump(self.manifest, file, indent=1)
@@ -0,0 +1,138 @@
+# SDM Project 2. Knowledge Graphs
+# Inverted full-text index of the papers, in a single file: the sorted term
+# and document (paper URI) lexicons and, per term, the sorted ids of the
+# papers it occurs in. The reader memory-maps the file, so a search reads
+# the posting lists of its terms and intersects them instead of scanning
+# every literal of the graph
+from pandas import DataFrame, Series
+import numpy as np
+import json
+import mmap
+import struct
+
+MAGIC = b'SDMTXT1\n'
+# Tokens are runs of ASCII letters and digits after case and accent folding
+TOKEN = r'[a-z0-9]+'
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has in is it of on or that the this to was were with'.split())
+
+
+def tokenize(texts):
+    # Series of strings -> Series of their terms, one row per token with the
+    # index of its string. Stop words and single characters are dropped and
+    # a plural s is folded, so 'Graphs' and 'graph' are the same term
+    folded = texts.dropna().astype(str).str.normalize('NFKD').str.encode('ascii', 'ignore')\
+        .str.decode('ascii').str.lower()
+    terms = folded.str.findall(TOKEN).explode().dropna()
+    terms = terms.where(~(terms.str.endswith('s') & ~terms.str.endswith('ss')
+                          & (terms.str.len() > 3)), terms.str[:-1])
+    return terms[(terms.str.len() > 1) & ~terms.isin(STOPWORDS)]
+
+
+def write_text_index(path, uris, texts):
+    # uris and texts are aligned: one row per text field of a document, so
+    # a paper may come with its title, abstract and every keyword
+    terms = tokenize(Series(texts, dtype=object).reset_index(drop=True))
+    documents = np.asarray(uris, dtype=str)
+    names = np.unique(documents)
+    pairs = DataFrame({'term': terms.to_numpy(dtype=str),
+                       'document': np.searchsorted(names, documents[terms.index.to_numpy()])})
+    pairs = pairs.drop_duplicates().sort_values(['term', 'document'], kind='stable')
+    lexicon, starts = np.unique(pairs['term'].to_numpy(dtype=str), return_index=True)
+
+    term_data, term_offsets = pack(lexicon)
+    document_data, document_offsets = pack(names)
+    sections = {
+        'term': term_data, 'term_offsets': term_offsets,
+        'document': document_data, 'document_offsets': document_offsets,
+        'posting_offsets': np.append(starts, len(pairs)).astype(np.uint64),
+        'postings': pairs['document'].to_numpy(dtype=np.uint32),
+    }
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        layout[name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps({'terms': len(lexicon), 'documents': len(names),
+                         'postings': len(pairs), 'sections': layout}).encode()
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+    with open(path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for array in sections.values():
+            file.write(array.tobytes())
+            file.write(b'\0' * (-array.nbytes % 8))
+    return len(lexicon), len(pairs)
+
+
+def pack(strings):
+    # Sorted strings as one UTF-8 blob and the offsets delimiting them
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class TextIndex():
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'Not a text index: {path}')
+        length, = struct.unpack_from('<Q', self.map, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self.map[start:start + length])
+        base = start + length
+        self.sections = {name: np.frombuffer(self.map, dtype=dtype, count=count, offset=base + offset)
+                         for name, (offset, dtype, count) in self.header['sections'].items()}
+
+    def __len__(self):
+        return self.header['documents']
+
+    def close(self):
+        # Views into the map must go before it can be closed
+        self.sections = None
+        self.map.close()
+        self.file.close()
+
+    def string(self, lexicon, id):
+        offsets = self.sections[lexicon + '_offsets']
+        return self.sections[lexicon][offsets[id]:offsets[id + 1]].tobytes().decode('utf-8')
+
+    def find(self, lexicon, string):
+        # Binary search of a sorted lexicon, the id of string or None
+        low, high = 0, len(self.sections[lexicon + '_offsets']) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(lexicon, middle) < string:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.sections[lexicon + '_offsets']) - 1 and self.string(lexicon, low) == string:
+            return low
+        return None
+
+    def postings(self, term):
+        # Sorted document ids of a term, a view into the map
+        id = self.find('term', term)
+        if id is None:
+            return np.zeros(0, dtype=np.uint32)
+        offsets = self.sections['posting_offsets']
+        return self.sections['postings'][offsets[id]:offsets[id + 1]]
+
+    def search(self, text):
+        # Ids of the documents with every term of text, intersecting the
+        # shortest posting lists first
+        terms = tokenize(Series([text])).unique()
+        if not len(terms):
+            return np.zeros(0, dtype=np.uint32)
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        documents = lists[0]
+        for postings in lists[1:]:
+            documents = np.intersect1d(documents, postings, assume_unique=True)
+        return documents
+
+    def document(self, id):
+        return self.string('document', int(id))
+
+    def document_id(self, uri):
+        return self.find('document', str(uri))
@@ -0,0 +1,92 @@
+# SDM Project 2. Knowledge Graphs
+# Destinations for the triples emitted by the generators
+from rdflib import Graph
+from generators.SQLiteStore import SQLiteStore
+from generators.NTriples import nt_term
+from generators.TripleTable import TripleTable
+from generators.HDTFile import write_hdt
+import gzip
+import io
+import shutil
+
+
+class EncodedSink():
+    # Accumulates triples as integer ids over a term dictionary, a fraction
+    # of the memory of an rdflib Graph, and writes them straight from the
+    # table once everything has been asserted
+
+    def __init__(self, path, namespace, format='turtle'):
+        self.path = path
+        self.namespace = namespace
+        self.format = format
+        self.table = TripleTable()
+
+    def add(self, triples):
+        self.table.add(triples)
+
+    def add_shard(self, path):
+        with open(path, encoding='utf-8') as shard:
+            self.table.add_ntriples(shard)
+
+    def close(self):
+        if self.format == 'hdt':
+            write_hdt(self.path, self.table, {'': str(self.namespace)})
+        else:
+            # 'turtle' is sorted and free of duplicates, 'fast-turtle' skips
+            # the sort
+            with open(self.path, 'w', encoding='utf-8', newline='\n',
+                      buffering=1 << 20) as file:
+                self.table.write_turtle(file, self.namespace, sort=self.format == 'turtle')
+
+
+class StoreSink():
+    # Adds triples to a persistent SQLite triple store, which query
+    # processes can reopen without parsing any Turtle
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.g = Graph(store=SQLiteStore())
+        self.g.open(path, create=True)
+        self.g.bind('', namespace)
+
+    def add(self, triples):
+        self.g.addN((s, p, o, self.g) for s, p, o in triples)
+
+    def add_shard(self, path):
+        self.g.parse(path, format='nt')
+
+    def close(self):
+        self.g.close()
+
+
+class NTriplesSink():
+    # Writes triples straight to a buffered N-Triples (or N-Quads, when a
+    # graph name is given) file as they are produced, so memory stays
+    # constant. Paths ending in .gz are gzip-compressed
+
+    def __init__(self, path, graph=None, buffer_size=1 << 20):
+        self.path = path
+        self.graph = graph
+        self.end = f' {nt_term(graph)} .\n' if graph is not None else ' .\n'
+        if path.endswith('.gz'):
+            # No timestamp in the gzip header, so identical builds produce
+            # identical files
+            self.file = io.TextIOWrapper(
+                gzip.GzipFile(path, 'wb', mtime=0), encoding='utf-8', newline='\n')
+        else:
+            self.file = open(path, 'w', encoding='utf-8',
+                             newline='\n', buffering=buffer_size)
+
+    def add(self, triples):
+        end = self.end
+        self.file.writelines(f'{nt_term(s)} {nt_term(p)} {nt_term(o)}{end}'
+                             for s, p, o in triples)
+
+    def add_shard(self, path):
+        # Shards are written by NTriplesSinks with the same graph name
+        with open(path, encoding='utf-8', newline='\n') as shard:
+            shutil.copyfileobj(shard, self.file, 1 << 20)
+
+    def close(self):
+        self.file.close()
+
@@ -0,0 +1,162 @@
+# SDM Project 2. Knowledge Graphs
+# Compact triple table: every distinct term is interned once in a
+# dictionary (in its N-Triples form) and triples are three integer columns.
+# rdflib terms are only materialized one at a time, on request (term)
+from rdflib.namespace import RDF, RDFS, XSD
+from generators.NTriples import nt_term, nt_to_term, split_line
+import numpy as np
+import re
+
+# Local names written as :name in Turtle, a conservative subset of PN_LOCAL
+LOCAL_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_\-]*')
+
+
+class TripleTable():
+
+    def __init__(self):
+        # id -> N-Triples term and back
+        self.terms = []
+        self.ids = {}
+        # Batches of encoded triples, concatenated on demand
+        self.chunks = []
+        self._s = self._p = self._o = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self._s) + sum(len(chunk) // 3 for chunk in self.chunks)
+
+    ########### Term dictionary ###########
+    def intern(self, text):
+        id = self.ids.get(text)
+        if id is None:
+            id = self.ids[text] = len(self.terms)
+            self.terms.append(text)
+        return id
+
+    def id(self, term):
+        return self.ids.get(nt_term(term))
+
+    def term(self, id):
+        return nt_to_term(self.terms[id])
+
+    ########### Triples ###########
+    def add(self, triples):
+        intern = self.intern
+        self.chunks.append(np.fromiter(
+            (intern(nt_term(term)) for triple in triples for term in triple), dtype=np.int64))
+
+    def add_ntriples(self, lines):
+        intern = self.intern
+        self.chunks.append(np.fromiter(
+            (intern(term) for line in lines if line.strip() for term in split_line(line)), dtype=np.int64))
+
+    def add_ids(self, s, p, o):
+        # Already encoded triples, e.g. derived by joins over the columns
+        self.chunks.append(np.column_stack((s, p, o)).ravel().astype(np.int64))
+
+    @property
+    def spo(self):
+        # The three columns, int32 as long as the dictionary allows it
+        if self.chunks:
+            ids = np.concatenate(self.chunks).reshape(-1, 3)
+            self.chunks = []
+            dtype = np.int32 if len(self.terms) < 2 ** 31 else np.int64
+            self._s = np.concatenate((self._s, ids[:, 0])).astype(dtype)
+            self._p = np.concatenate((self._p, ids[:, 1])).astype(dtype)
+            self._o = np.concatenate((self._o, ids[:, 2])).astype(dtype)
+        return self._s, self._p, self._o
+
+    def sort(self, order='spo'):
+        # Sorts in place by the given column order and drops duplicates
+        columns = dict(zip('spo', self.spo))
+        keys = [columns[c] for c in reversed(order)]
+        index = np.lexsort(keys)
+        s, p, o = (columns[c][index] for c in 'spo')
+        keep = np.ones(len(s), dtype=bool)
+        keep[1:] = (s[1:] != s[:-1]) | (p[1:] != p[:-1]) | (o[1:] != o[:-1])
+        self._s, self._p, self._o = s[keep], p[keep], o[keep]
+        return self
+
+    ########### Serialization ###########
+    def write_ntriples(self, file):
+        terms = self.terms
+        file.writelines(f'{terms[s]} {terms[p]} {terms[o]} .\n'
+                        for s, p, o in zip(*(column.tolist() for column in self.spo)))
+
+    def write_turtle(self, file, namespace, sort=False):
+        # Streaming Turtle without rdflib's prefix analysis: one block per
+        # subject, subjects in order of first appearance (or of their terms,
+        # with sort, which also drops duplicate triples as a graph would),
+        # and the namespace written as the ':' prefix. N-Triples terms are
+        # valid Turtle as they are, so only names under a prefix are rewritten
+        prefixes = {'': str(namespace), 'rdf': str(RDF), 'rdfs': str(RDFS), 'xsd': str(XSD)}
+        terms = [turtle_term(text, prefixes) for text in self.terms]
+        predicates = list(terms)
+        rdf_type = self.ids.get(nt_term(RDF.type))
+        if rdf_type is not None:
+            predicates[rdf_type] = 'a'
+
+        # Grouped by subject, then by predicate for object lists
+        s, p, o = self.spo
+        if sort:
+            rank = np.empty(len(self.terms), dtype=np.int64)
+            rank[sorted(range(len(self.terms)), key=self.terms.__getitem__)] = np.arange(len(self.terms))
+            order = np.lexsort((rank[o], rank[p], rank[s]))
+            s, p, o = s[order], p[order], o[order]
+            keep = np.ones(len(s), dtype=bool)
+            keep[1:] = (s[1:] != s[:-1]) | (p[1:] != p[:-1]) | (o[1:] != o[:-1])
+            s, p, o = s[keep], p[keep], o[keep]
+        else:
+            order = np.lexsort((p, s))
+            s, p, o = s[order], p[order], o[order]
+        file.writelines(f'@prefix {prefix}: <{uri}> .\n' for prefix, uri in prefixes.items())
+        previous = None, None
+        for s, p, o in zip(s.tolist(), p.tolist(), o.tolist()):
+            if (s, p) == previous:
+                file.write(f',\n        {terms[o]}')
+            elif s == previous[0]:
+                file.write(f' ;\n    {predicates[p]} {terms[o]}')
+            else:
+                if previous[0] is not None:
+                    file.write(' .\n')
+                file.write(f'\n{terms[s]} {predicates[p]} {terms[o]}')
+            previous = s, p
+        if previous[0] is not None:
+            file.write(' .\n')
+
+    ########### Persistence ###########
+    def save(self, path):
+        # N-Triples terms never contain raw newlines, so the dictionary is
+        # stored one term per line next to the columns
+        s, p, o = self.spo
+        np.savez(path, s=s, p=p, o=o,
+                 terms=np.frombuffer('\n'.join(self.terms).encode('utf-8'), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        table = cls()
+        with np.load(path) as data:
+            table._s, table._p, table._o = data['s'], data['p'], data['o']
+            text = data['terms'].tobytes().decode('utf-8')
+        table.terms = text.split('\n') if text else []
+        table.ids = {term: id for id, term in enumerate(table.terms)}
+        return table
+
+
+def turtle_term(text, prefixes):
+    # Prefixed name for an IRI, or for the datatype of a literal, when the
+    # local name is safe to write unquoted
+    if text[0] == '<':
+        return prefixed_name(text[1:-1], prefixes) or text
+    if text[-1] == '>' and '"^^<' in text:
+        lexical, datatype = text.rsplit('^^<', 1)
+        name = prefixed_name(datatype[:-1], prefixes)
+        if name:
+            return f'{lexical}^^{name}'
+    return text
+
+
+def prefixed_name(uri, prefixes):
+    for prefix, namespace in prefixes.items():
+        if uri.startswith(namespace) and LOCAL_NAME.fullmatch(uri, len(namespace)):
+            return f'{prefix}:{uri[len(namespace):]}'
+    return None
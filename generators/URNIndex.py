@@ -0,0 +1,70 @@
+# SDM Project 2. Knowledge Graphs
+# Hash index from natural keys (e.g. author names, paper ids) to URNs. The
+# hash table is built once per index and every key column is resolved with
+# a single lookup and an array take
+from pandas import Series, concat
+from pandas.api.extensions import take
+import numpy as np
+
+
+class URNIndex():
+
+    def __init__(self, name):
+        self.name = name
+        self.urns = Series(dtype=object)
+        # Checked and dangling rows per relation and key column
+        self.unresolved = {}
+        # Rows per node table left out of the index for an NA key
+        self.unkeyed = {}
+
+    def add(self, df, key, id, unique=True):
+        # With unique, repeated keys keep their first URN, as the row-by-row
+        # lookup it replaces did. Otherwise every URN of a key is kept and a
+        # lookup returns all of them, as a left merge would. NA keys are not
+        # indexed, so no edge resolves through them
+        keyed = df[key].notna().to_numpy()
+        if not keyed.all():
+            self.unkeyed[id] = self.unkeyed.get(id, 0) + int((~keyed).sum())
+            df = df[keyed]
+        urns = Series(df[id].to_numpy(), index=df[key].to_numpy())
+        urns = concat([self.urns, urns])
+        self.urns = urns[~urns.index.duplicated(keep='first')] if unique else urns
+
+    def lookup(self, df, key, column):
+        # Left merge of df with the index on key: the URNs are added as
+        # column, NaN where the key is not indexed
+        keys = df[key].to_numpy()
+        index = self.urns.index
+        if index.is_unique:
+            positions = index.get_indexer(keys)
+        else:
+            # Rows with several URNs are repeated once per URN
+            positions, _ = index.get_indexer_non_unique(keys)
+            matches = index.value_counts(dropna=False).reindex(keys).fillna(1)
+            df = df.take(np.repeat(np.arange(len(df)), matches.to_numpy(dtype=np.int64)))
+        urns = take(self.urns.to_numpy(), positions, allow_fill=True)
+        return df.assign(**{column: urns})
+
+    def resolve(self, df, key, id, relation):
+        # Lookup that also checks referential integrity: rows whose key is
+        # NA, unparseable or not indexed are dangling edges, counted and
+        # dropped instead of being asserted with a NaN URN
+        df = self.lookup(df, key, id)
+        missing = df[id].isna().to_numpy()
+        n_missing = int(missing.sum())
+        counts = self.unresolved.setdefault(relation, {}).setdefault(
+            key, {'checked': 0, 'dangling': 0})
+        counts['checked'] += len(df)
+        if n_missing:
+            counts['dangling'] += n_missing
+            df = df[~missing]
+        return df
+
+    def report(self):
+        for node, n in self.unkeyed.items():
+            print(f'Warning: {n} {node}(s) with no {self.name} key are not indexed')
+        for relation, keys in self.unresolved.items():
+            for key, counts in keys.items():
+                if counts['dangling']:
+                    print(f"Warning: {counts['dangling']} {relation} edge(s) with an unknown "
+                          f'{self.name} {key} were skipped')
@@ -0,0 +1,8 @@
+# SDM Project 2. Knowledge Graphs
+# rdflib store plugins of the package, registered once for every module
+# that imports from it: Graph('SQLite') and Graph('HDT')
+from rdflib import plugin
+from rdflib.store import Store
+
+plugin.register('SQLite', Store, 'generators.SQLiteStore', 'SQLiteStore')
+plugin.register('HDT', Store, 'generators.HDTFile', 'HDTStore')
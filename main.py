@@ -1,18 +1,130 @@
 from generators.TBOXGenerator import TBOXGenerator
 from generators.ABOXGenerator import ABOXGenerator
+from generators.RDFSMaterializer import RDFSMaterializer
+from generators.IncrementalReasoner import IncrementalReasoner
+from generators.ABOXDiff import ABOXDiff, PATCH_FORMATS
+from generators.Instrumentation import Instrumentation, JSONLinesSink
+from generators.BuildManifest import stamp_build
+from generators.TripleSink import StoreSink
+from generators.URNMinter import SCHEMES as URN_SCHEMES
+from rdflib import Namespace
+import argparse
 import os
 import os.path as op
 
+# ABOX file name per output format
+ABOX_FILES = {'turtle': 'ABOX.ttl', 'fast-turtle': 'ABOX.ttl', 'nt': 'ABOX.nt',
+              'nquads': 'ABOX.nq', 'store': 'KG.sqlite', 'hdt': 'ABOX.hdt'}
+
 
 def main():
 
+    parser = argparse.ArgumentParser()
+    # 'nt' and 'nquads' stream the ABOX to disk with constant memory,
+    # 'store' loads TBOX and ABOX into one persistent SQLite triple store,
+    # 'hdt' also writes both as binary HDT-style files
+    parser.add_argument('--format', choices=ABOX_FILES, default='turtle')
+    parser.add_argument('--gzip', action='store_true',
+                        help='gzip-compress a streamed ABOX')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='ABOX stages run concurrently on this many processes')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only re-run ABOX stages whose input CSVs changed')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='read edge CSVs in chunks of this many rows')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always rebuild the URN tables from the CSVs')
+    parser.add_argument('--infer', action='store_true',
+                        help='materialize the RDFS closure in output/INFERRED.nt')
+    parser.add_argument('--incremental-infer', action='store_true',
+                        help='with --infer, only reason over the triples changed since the last build')
+    parser.add_argument('--urn-scheme', choices=URN_SCHEMES, default='positional',
+                        help="'hash' mints URNs from natural keys, independent of row order")
+    parser.add_argument('--diff', choices=PATCH_FORMATS,
+                        help='write the changes since the previous build as a '
+                             'SPARQL Update or RDF Patch in output/ABOX.patch.*')
+    parser.add_argument('--metrics', action='store_true',
+                        help='assert citation counts, PageRank and h-indexes, '
+                             'and write output/citations.json')
+    parser.add_argument('--text-index', action='store_true',
+                        help='write an inverted index of paper titles, abstracts and '
+                             'keywords to output/TEXT.idx, for text:matches in queries')
+    parser.add_argument('--instrument', metavar='PATH',
+                        help='write time, rows, triples and memory of every stage '
+                             'as JSON lines to PATH')
+    parser.add_argument('--profile', action='store_true',
+                        help='with --instrument, dump a cProfile of every stage '
+                             'to output/profile/')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='with --instrument, record the peak allocation of every stage')
+    args = parser.parse_args()
+
     BASEURL = "https://SDM.org/Lab2"
     output_dir = op.join(os.getcwd(), 'output')
 
-    TBOXGenerator(BASEURL, op.join(output_dir, 'TBOX.ttl'))
-    ABOXGenerator(BASEURL, op.join(output_dir, 'ABOX.ttl'))
+    abox_file = ABOX_FILES[args.format]
+    if args.gzip:
+        if args.format in ('turtle', 'fast-turtle', 'store', 'hdt'):
+            parser.error('--gzip requires a streamed format (nt or nquads)')
+        abox_file += '.gz'
+
+    instrument = None
+    if args.instrument:
+        instrument = Instrumentation(JSONLinesSink(args.instrument),
+                                     op.join(output_dir, 'profile') if args.profile else None,
+                                     args.tracemalloc)
+    elif args.profile or args.tracemalloc:
+        parser.error('--profile and --tracemalloc require --instrument')
+    if args.incremental_infer and not args.infer:
+        parser.error('--incremental-infer requires --infer')
+
+    store_path = None
+    if args.format == 'store':
+        # The store is rebuilt from scratch on every run
+        store_path = op.join(output_dir, abox_file)
+        if op.exists(store_path):
+            os.remove(store_path)
+
+    TBOXGenerator(BASEURL, op.join(output_dir, 'TBOX.ttl'), store_path=store_path,
+                  format='fast-turtle' if args.format == 'fast-turtle' else 'turtle',
+                  hdt_path=op.join(output_dir, 'TBOX.hdt') if args.format == 'hdt' else None,
+                  instrument=instrument)
+    ABOXGenerator(BASEURL, op.join(output_dir, abox_file), format=args.format,
+                  workers=args.workers, incremental=args.incremental, chunksize=args.chunksize,
+                  cache_path=None if args.no_cache else op.join(output_dir, 'cache'),
+                  metrics=args.metrics, urn_scheme=args.urn_scheme, instrument=instrument,
+                  text_index=args.text_index)
+    if instrument:
+        instrument.close()
+    if args.diff:
+        # Compared with output/ABOX.snapshot.nt, left by the previous --diff build
+        ABOXDiff(op.join(output_dir, abox_file), output_dir, args.diff)
+
+    if args.infer:
+        inferred_path = op.join(output_dir, 'INFERRED.nt')
+        if args.incremental_infer:
+            # Reasoner state persists in output/reasoner between builds
+            IncrementalReasoner().materialize(op.join(output_dir, 'TBOX.ttl'),
+                                              op.join(output_dir, abox_file), inferred_path)
+        else:
+            RDFSMaterializer(op.join(output_dir, 'TBOX.ttl'),
+                             op.join(output_dir, abox_file), inferred_path)
+        if store_path:
+            # Inferred triples become plain index lookups in the store
+            sink = StoreSink(store_path, Namespace(BASEURL))
+            sink.add_shard(inferred_path)
+            sink.close()
+
+    # Query processes compare this version with the build they loaded, and
+    # cached query results are only valid for it
+    built = [op.join(output_dir, 'TBOX.ttl'), op.join(output_dir, abox_file)]
+    if args.infer:
+        built.append(op.join(output_dir, 'INFERRED.nt'))
+    if args.text_index:
+        built.append(op.join(output_dir, 'TEXT.idx'))
+    stamp_build(op.join(output_dir, 'build.json'), built)
 
     return None
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,282 @@
+# SDM Project 2. Knowledge Graphs
+# SPARQL 1.1 Protocol endpoint on asyncio. The event loop only parses HTTP
+# and dispatches: queries run in a pool of worker processes that each hold
+# the loaded graph (forked from the process that loaded it once, where the
+# platform allows), so they evaluate in parallel despite rdflib's pure-Python
+# evaluator. Queries beyond the pool wait in a bounded queue, further ones
+# are turned away with 503, and every query has a timeout
+from queries.QueryRunner import QueryRunner
+from queries.ResultCache import ResultCache
+from generators.NTriples import nt_term
+from rdflib import URIRef, BNode
+from pyparsing import ParseException
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+import asyncio
+import json
+import multiprocessing
+import numpy as np
+import os
+import signal
+import time
+
+# Query runner of a worker process
+RUNNER = None
+# Seconds the server waits past the query timeout before giving up on a
+# worker that did not stop by itself
+GRACE = 5
+MAX_BODY = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+########### Worker processes ###########
+def make_runner(baseURL, paths=None, store_path=None, cache_mb=None, cache_dir=None):
+    cache = ResultCache((cache_mb or 64) << 20, cache_dir) if cache_mb or cache_dir else None
+    return QueryRunner(baseURL, paths, store_path, cache)
+
+
+def init_worker(options):
+    global RUNNER
+    # Ctrl-C stops the server, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, on_timeout)
+    if RUNNER is None:
+        RUNNER = make_runner(**options)
+
+
+def on_timeout(signum, frame):
+    raise QueryTimeout()
+
+
+def run_query(text, timeout):
+    # The serialized result as (content type, body). The alarm interrupts
+    # the evaluation when it runs past the timeout
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        kind, variables, value = RUNNER.answer(text)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return serialize(kind, variables, value)
+
+
+def serialize(kind, variables, value):
+    # SPARQL 1.1 Query Results JSON for SELECT and ASK, N-Triples otherwise
+    if kind == 'SELECT':
+        names = [str(variable) for variable in variables]
+        bindings = [{name: json_term(term) for name, term in zip(names, row) if term is not None}
+                    for row in value]
+        body = {'head': {'vars': names}, 'results': {'bindings': bindings}}
+        return 'application/sparql-results+json', json.dumps(body).encode()
+    if kind == 'ASK':
+        return 'application/sparql-results+json', json.dumps({'head': {}, 'boolean': value}).encode()
+    return 'application/n-triples', ''.join(
+        f'{nt_term(s)} {nt_term(p)} {nt_term(o)} .\n' for s, p, o in value).encode()
+
+
+def json_term(term):
+    if isinstance(term, URIRef):
+        return {'type': 'uri', 'value': str(term)}
+    if isinstance(term, BNode):
+        return {'type': 'bnode', 'value': str(term)}
+    binding = {'type': 'literal', 'value': str(term)}
+    if term.language:
+        binding['xml:lang'] = term.language
+    elif term.datatype:
+        binding['datatype'] = str(term.datatype)
+    return binding
+
+
+########### Server ###########
+class SPARQLEndpoint():
+
+    def __init__(self, runner_options, workers=4, max_queue=64, timeout=30.0,
+                 host='127.0.0.1', port=8000):
+        global RUNNER
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.host, self.port = host, port
+        self.counters = {'requests': 0, 'queries': 0, 'completed': 0, 'errors': 0,
+                         'timeouts': 0, 'rejected': 0}
+        self.queued = self.running = 0
+        # Latencies of the last queries, in seconds
+        self.latencies = deque(maxlen=1000)
+
+        print(f'Loading the graph for {workers} worker(s)...')
+        # Forked workers share the graph loaded here. SQLite connections
+        # must not cross a fork, so store workers open their own
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods() and not runner_options.get('store_path'):
+            RUNNER = make_runner(**runner_options)
+            if RUNNER.loaded_store:
+                RUNNER.close()
+                RUNNER = None
+            else:
+                context = multiprocessing.get_context('fork')
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                        initializer=init_worker, initargs=(runner_options,))
+        # Starts every worker now rather than on the first queries
+        for future in [self.pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+        RUNNER = None
+        print('Graph loaded!')
+
+    def start(self):
+        print(f'SPARQL endpoint on http://{self.host}:{self.port}/sparql '
+              f'(counters on /stats)')
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def serve(self):
+        # At most one query per worker in the pool, the others wait here
+        self.slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    ########### HTTP ###########
+    async def handle(self, reader, writer):
+        # One connection, kept alive until the client closes it or asks to
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.counters['requests'] += 1
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if body is None:
+                    # The unread body is still on the connection, which
+                    # cannot carry another request
+                    status, content_type, payload, extra = text_response(413, 'Request body too large')
+                    keep_alive = False
+                else:
+                    status, content_type, payload, extra = await self.route(method, target, headers, body)
+                head = [f'HTTP/1.1 {status} {REASONS[status]}',
+                        f'Content-Type: {content_type}',
+                        f'Content-Length: {len(payload)}',
+                        f'Connection: {"keep-alive" if keep_alive else "close"}']
+                head += [f'{name}: {value}' for name, value in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, 'application/json', json.dumps(self.stats()).encode(), {}
+        if url.path != '/sparql':
+            return text_response(404, 'Not found')
+        # Query string (GET), form (POST) or the query itself as the body
+        if method == 'GET':
+            parameters = parse_qs(url.query)
+        elif method == 'POST':
+            content_type = headers.get('content-type', '').split(';')[0].strip()
+            if content_type == 'application/sparql-query':
+                parameters = {'query': [body.decode('utf-8')]}
+            else:
+                parameters = parse_qs(body.decode('utf-8'))
+        else:
+            return text_response(405, 'Use GET or POST')
+        if 'query' not in parameters:
+            return text_response(400, 'Missing query parameter')
+        return await self.dispatch(parameters['query'][0])
+
+    ########### Dispatch ###########
+    async def dispatch(self, text):
+        self.counters['queries'] += 1
+        if self.queued >= self.max_queue:
+            self.counters['rejected'] += 1
+            status = text_response(503, 'Too many queries waiting, retry later')
+            return status[:3] + ({'Retry-After': '1'},)
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            future = self.pool.submit(run_query, text, self.timeout)
+        except BrokenProcessPool:
+            self.finished()
+            self.counters['errors'] += 1
+            return text_response(500, 'A query worker died')
+        # The slot stays taken until the worker is done with the query, even
+        # when the server has stopped waiting for it
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self.finished))
+        try:
+            content_type, payload = await asyncio.wait_for(asyncio.wrap_future(future),
+                                                           self.timeout + GRACE)
+        except (QueryTimeout, asyncio.TimeoutError):
+            self.counters['timeouts'] += 1
+            return text_response(503, f'Query timed out after {self.timeout:g} s')
+        except ParseException as error:
+            self.counters['errors'] += 1
+            return text_response(400, f'Query parse error: {error}')
+        except BrokenProcessPool:
+            self.counters['errors'] += 1
+            return text_response(500, 'A query worker died')
+        except Exception as error:
+            self.counters['errors'] += 1
+            return text_response(400, f'Query failed: {error!r}')
+        self.counters['completed'] += 1
+        self.latencies.append(time.perf_counter() - start)
+        return 200, content_type, payload, {}
+
+    def finished(self):
+        self.running -= 1
+        self.slots.release()
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        summary = {}
+        if len(latencies):
+            summary = {'mean': latencies.mean(), 'max': latencies.max(),
+                       **{f'p{q}': np.percentile(latencies, q) for q in (50, 95, 99)}}
+        return {**self.counters, 'workers': self.workers, 'running': self.running,
+                'queue_depth': self.queued, 'max_queue': self.max_queue,
+                'latency_ms': {name: round(float(value), 3) for name, value in summary.items()}}
+
+
+async def read_request(reader):
+    # Method, target, lower-cased headers and body of the next request, or
+    # None at the end of the connection. A body over MAX_BODY is left unread
+    # and returned as None
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        return method, target, headers, None
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def text_response(status, message):
+    return status, 'text/plain; charset=utf-8', (message + '\n').encode(), {}
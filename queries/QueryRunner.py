@@ -0,0 +1,357 @@
+# SDM Project 2. Knowledge Graphs
+# SPARQL query runner: loads the knowledge graph once and runs the report's
+# analytic queries as prepared queries with bound parameters, optionally
+# through a result cache keyed on the build version of the loaded graph.
+# With the full-text index of main.py --text-index, a ?paper text:matches
+# "terms" pattern is answered from its posting lists
+from rdflib import Graph, Dataset, Namespace, Literal, Variable, BNode, URIRef
+from rdflib.namespace import RDF, RDFS
+from rdflib.util import guess_format
+from rdflib.plugins.sparql import prepareQuery, CUSTOM_EVALS
+from rdflib.plugins.sparql.evaluate import evalBGP
+from rdflib.query import ResultRow
+from rdflib.store import VALID_STORE
+from generators.BuildManifest import build_version, build_files
+from generators.TextIndex import TextIndex
+from generators.HDTFile import HDTFile
+import numpy as np
+import gzip
+import os
+import os.path as op
+import time
+
+# Full-text search: ?paper text:matches "some terms" binds the papers whose
+# title, abstract or keywords contain every term
+TEXT = Namespace('https://SDM.org/Lab2/text#')
+
+# Named queries, with the parameters they accept and their default values.
+# Parameters left as None stay unbound
+QUERIES = {
+    'authors': ('''
+        SELECT ?a
+        WHERE { ?a rdf:type :author . }
+        LIMIT 10''', {}),
+    'author_properties': ('''
+        SELECT ?p
+        WHERE { ?p rdfs:domain :author . }''', {}),
+    'venue_properties': ('''
+        SELECT ?p
+        WHERE { { ?p rdfs:domain :conference } UNION { ?p rdfs:domain :journal } }''', {}),
+    'papers_by_author': ('''
+        SELECT ?a ?p
+        WHERE {
+            ?p rdf:type :paper .
+            ?p :published_in_c ?cmpl .
+            ?cmpl :belongs_to_v ?ven .
+            ?ven :v_in ?com .
+            ?com :name_community ?community .
+            ?a :writes ?p .
+            ?a rdf:type :author .
+            ?a :name_author ?author_name .
+        }
+        ORDER BY ?a''', {'community': 'Database', 'author_name': None}),
+    'top_cited_papers': ('''
+        SELECT ?ven1 ?p1 (COUNT(?p1) AS ?times_cited)
+        WHERE {
+            ?p :published_in_c ?cmpl .
+            ?cmpl :belongs_to_v ?ven .
+            ?ven :v_in ?com .
+            ?com :name_community ?community .
+            ?p :cites ?p1 .
+            ?p1 :published_in_c ?cmpl1 .
+            ?cmpl1 :belongs_to_v ?ven1 .
+            ?ven1 :v_in ?com1 .
+            ?com1 :name_community ?community .
+        }
+        GROUP BY ?p1 ?ven1
+        ORDER BY DESC(?times_cited)
+        LIMIT 5''', {'community': 'Database'}),
+    'top_conferences': ('''
+        SELECT ?conference (COUNT(?paper) AS ?nlp_paper_count) (SUM(?citeCount) AS ?sum_citations_nlp)
+        WHERE {
+            ?paper rdf:type :paper .
+            ?paper :relates_to ?kw .
+            ?kw :name_keyword ?keyword .
+            ?paper :published_in_c ?compilation .
+            ?compilation :belongs_to_v ?conference .
+            ?conference rdf:type :conference .
+            ?paper :cites ?citedPaper .
+            ?citedPaper rdf:type :paper .
+            ?citedPaper :relates_to ?kw .
+            {
+                SELECT ?citedPaper (COUNT(?citingPaper) AS ?citeCount)
+                WHERE { ?citingPaper :cites ?citedPaper . }
+                GROUP BY ?citedPaper
+            }
+        }
+        GROUP BY ?conference
+        ORDER BY DESC(?nlp_paper_count) DESC(?sum_citations_nlp)
+        LIMIT 5''', {'keyword': 'NLP'}),
+    'papers_about': ('''
+        SELECT ?p ?title
+        WHERE {
+            ?p text:matches ?topic .
+            ?p :name_paper ?title .
+            ?p :published_in_c ?cmpl .
+            ?cmpl :belongs_to_v ?ven .
+            ?ven :v_in ?com .
+            ?com :name_community ?community .
+        }
+        ORDER BY ?p''', {'topic': 'data management', 'community': 'Database'}),
+}
+
+
+# Named queries that match types and :v_in, which the ABOX only holds
+# through the RDFS closure of main.py --infer (domains, ranges and
+# subproperties). Without it they return no rows
+INFERRED_QUERIES = {'authors', 'papers_by_author', 'top_cited_papers', 'top_conferences',
+                    'papers_about'}
+
+
+class QueryRunner():
+
+    output_dir = op.join(os.getcwd(), 'output')
+
+    def __init__(self, baseURL='http://SDM.org/Lab2/', paths=None, store_path=None, cache=None,
+                 build_path=op.join(output_dir, 'build.json'),
+                 text_index_path=op.join(output_dir, 'TEXT.idx')):
+        self.n = Namespace(baseURL)
+        self.namespaces = {'': self.n, 'rdf': RDF, 'rdfs': RDFS, 'text': TEXT}
+        # Parsed and translated queries, by name
+        self.prepared = {}
+        self.paths = paths
+        self.store_path = store_path
+        self.cache = cache
+        # Version stamped by main.py. A new build is reloaded before the
+        # next query, and the cache moves to its version
+        self.build_path = build_path
+        self.build_mtime = None
+        self.text_index_path = text_index_path
+        self.text_index = None
+        self.g = None
+        self.load()
+
+    def load(self):
+        # The graph is loaded once and shared by every run
+        if self.g is not None:
+            self.g.close()
+        self.build_mtime = self.stamp_mtime()
+        self.version = build_version(self.build_path)
+        files = build_files(self.build_path)
+        # By default the graph is what the last build stamped, so it always
+        # matches the version: TBOX, the ABOX in the format built and the
+        # RDFS closure of main.py --infer. A store build holds all of them
+        paths, store_path = self.paths, self.store_path
+        if paths is None and store_path is None:
+            if files is None:
+                files = ['TBOX.ttl', 'ABOX.ttl']
+            paths = [op.join(self.output_dir, name) for name in files
+                     if not self.text_index_path or name != op.basename(self.text_index_path)]
+            store_path = next((path for path in paths if path.endswith('.sqlite')), None)
+        files = files or []
+        self.inferred = 'INFERRED.nt' in (files if self.paths is None
+                                          else [op.basename(path) for path in self.paths])
+        self.loaded_store = store_path
+        if store_path:
+            self.g = Graph('SQLite')
+            if self.g.open(store_path) != VALID_STORE:
+                raise FileNotFoundError(f'No triple store at {store_path}')
+        else:
+            self.g = Graph()
+            for path in paths:
+                parse(self.g, path)
+        self.g.bind('', self.n)
+        # Found by text:matches patterns through the graph they query. An
+        # index left by an earlier build is not part of this one
+        if self.text_index is not None:
+            self.text_index.close()
+            self.text_index = None
+        if self.text_index_path and op.basename(self.text_index_path) in files:
+            self.text_index = TextIndex(self.text_index_path)
+        self.g.text_index = self.text_index
+        if self.cache is not None:
+            self.cache.set_version(self.version)
+
+    def stamp_mtime(self):
+        try:
+            return os.stat(self.build_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        # Reloads the graph when main.py has stamped a new build since
+        if self.stamp_mtime() != self.build_mtime\
+                and build_version(self.build_path) != self.version:
+            self.load()
+        else:
+            self.build_mtime = self.stamp_mtime()
+
+    def prepare(self, name):
+        query = self.prepared.get(name)
+        if query is None:
+            query = self.prepared[name] = prepareQuery(
+                QUERIES[name][0], initNs=self.namespaces)
+        return query
+
+    def missing(self, name):
+        # What a named query needs that the loaded build lacks, or None:
+        # the full-text index to match text, the RDFS closure to match types
+        if self.text_index is None and 'text:matches' in QUERIES[name][0]:
+            return 'the full-text index (python main.py --text-index)'
+        if not self.inferred and name in INFERRED_QUERIES:
+            return 'the RDFS closure (python main.py --infer)'
+        return None
+
+    def run(self, name, **parameters):
+        # Returns the result rows and the latency in seconds
+        bindings = {**QUERIES[name][1], **parameters}
+        bindings = {variable: Literal(value) for variable, value in bindings.items()
+                    if value is not None}
+        return self.execute(QUERIES[name][0], bindings, self.prepare(name))
+
+    def execute(self, text, bindings=None, prepared=None):
+        # Any SPARQL query: SELECT rows, the ASK answer or CONSTRUCT /
+        # DESCRIBE triples, and the latency in seconds
+        start = time.perf_counter()
+        packed = self.answer(text, bindings, prepared)
+        return unpack(packed), time.perf_counter() - start
+
+    def answer(self, text, bindings=None, prepared=None):
+        # The result as (type, variables, value) of plain Python values, as
+        # cached. Without a build version stamp results are not cached
+        self.refresh()
+        bindings = bindings or {}
+        key = None
+        if self.cache is not None and self.version is not None:
+            key = self.cache.key(text, bindings)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        result = self.g.query(prepared if prepared is not None else text,
+                              initNs=self.namespaces, initBindings=bindings)
+        if result.type == 'SELECT':
+            packed = ('SELECT', list(result.vars), [tuple(row) for row in result])
+        elif result.type == 'ASK':
+            packed = ('ASK', None, result.askAnswer)
+        else:
+            packed = (result.type, None, list(result))
+        if key is not None:
+            self.cache.put(key, packed)
+        return packed
+
+    def search(self, text):
+        # Papers whose title, abstract or keywords contain every term of
+        # text, from the full-text index alone
+        self.refresh()
+        if self.text_index is None:
+            raise FileNotFoundError(f'No text index at {self.text_index_path}, '
+                                    'build it with main.py --text-index')
+        return [URIRef(self.text_index.document(id)) for id in self.text_index.search(text)]
+
+    def close(self):
+        self.g.close()
+        if self.text_index is not None:
+            self.text_index.close()
+
+
+def parse(g, path):
+    # Any file main.py writes: RDF files rdflib can guess the format of,
+    # gzip-compressed or not, N-Quads (added to the default graph) and HDT
+    if path.endswith('.hdt'):
+        hdt = HDTFile(path)
+        g.addN((s, p, o, g) for s, p, o in hdt.triples())
+        hdt.close()
+        return
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as file:
+        if name.endswith('.nq'):
+            dataset = Dataset()
+            dataset.parse(file, format='nquads')
+            g.addN((s, p, o, g) for s, p, o, _ in dataset.quads())
+        else:
+            g.parse(file, format=guess_format(name))
+
+
+def unpack(packed):
+    # Cached results hold plain tuples, returned as ResultRows again
+    kind, variables, value = packed
+    if kind == 'SELECT':
+        return [ResultRow(dict(zip(variables, row)), variables) for row in value]
+    return value
+
+
+def eval_bgp(ctx, part):
+    # Basic graph patterns are evaluated in the order given by plan, with
+    # the variables already bound (parameters, outer patterns) as known
+    if part.name != 'BGP':
+        raise NotImplementedError()
+    known = {term for triple in part.triples for term in triple
+             if isinstance(term, (Variable, BNode)) and ctx[term] is not None}
+    searches = [triple for triple in part.triples if triple[1] == TEXT.matches]
+    if searches:
+        triples = [triple for triple in part.triples if triple[1] != TEXT.matches]
+        return eval_text_search(ctx, searches, triples, known)
+    return evalBGP(ctx, plan(part.triples, known))
+
+
+def eval_text_search(ctx, searches, triples, known):
+    # The papers of every text:matches pattern come from the posting lists
+    # of its terms, intersected per subject. The rest of the pattern is then
+    # evaluated with each matching paper bound, instead of scanning literals
+    index = getattr(ctx.graph, 'text_index', None)
+    if index is None:
+        raise ValueError('text:matches needs the full-text index, build it with main.py --text-index')
+    matches = {}
+    for subject, _, text in searches:
+        value = ctx[text] if isinstance(text, (Variable, BNode)) else text
+        if value is None:
+            raise ValueError('text:matches needs a search string')
+        documents = index.search(str(value))
+        if subject in matches:
+            documents = np.intersect1d(matches[subject], documents, assume_unique=True)
+        matches[subject] = documents
+    return bind_matches(ctx, index, list(matches.items()), triples, known)
+
+
+def bind_matches(ctx, index, matches, triples, known):
+    if not matches:
+        yield from evalBGP(ctx, plan(triples, known))
+        return
+    (subject, documents), matches = matches[0], matches[1:]
+    bound = ctx[subject] if isinstance(subject, (Variable, BNode)) else subject
+    if bound is not None:
+        id = index.document_id(bound)
+        if id is not None and documents[np.searchsorted(documents, id):][:1].tolist() == [id]:
+            yield from bind_matches(ctx, index, matches, triples, known)
+        return
+    for id in documents:
+        solution = ctx.push()
+        solution[subject] = URIRef(index.document(id))
+        yield from bind_matches(solution, index, matches, triples, known | {subject})
+
+
+def plan(triples, known):
+    # Greedy join order. rdflib evaluates first every pattern with the most
+    # bound terms, which turns queries with several typed patterns (common
+    # under RDFS inference) into cartesian products. Here the most bound
+    # pattern goes first, then always one that shares a variable with the
+    # patterns already evaluated. On ties, rdf:type patterns, the least
+    # selective ones, go last
+    remaining, ordered, known = list(triples), [], set(known)
+
+    def key(triple):
+        variables = [term for term in triple if isinstance(term, (Variable, BNode))]
+        connected = not (ordered or known) or any(term in known for term in variables)
+        bound = 3 - sum(term not in known for term in variables)
+        return connected, bound, triple[1] != RDF.type
+
+    while remaining:
+        best = max(remaining, key=key)
+        remaining.remove(best)
+        ordered.append(best)
+        known.update(term for term in best if isinstance(term, (Variable, BNode)))
+    return ordered
+
+
+CUSTOM_EVALS['join_order'] = eval_bgp
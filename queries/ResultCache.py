@@ -0,0 +1,105 @@
+# SDM Project 2. Knowledge Graphs
+# SPARQL result cache. Results are keyed on the normalized query text, the
+# parameter bindings and the build version of the graph they were computed
+# on. Results are kept pickled, in an LRU memory tier bounded in bytes and
+# optionally in a disk tier with one directory per build version. Moving to
+# a new version drops the memory tier; directories of other versions are
+# only removed when a process starts using the disk tier
+from collections import OrderedDict
+import hashlib
+import os
+import os.path as op
+import pickle
+import re
+import shutil
+
+# String literals and IRIs are kept whole, comments dropped, and any other
+# run of whitespace becomes a single space
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|<[^<>\s]*>|#[^\n]*|\S+')
+
+
+def normalize(query):
+    return ' '.join(token for token in TOKEN.findall(query) if not token.startswith('#'))
+
+
+class ResultCache():
+
+    def __init__(self, max_bytes=64 << 20, disk_path=None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.version = None
+        # key -> pickled result, least recently used first
+        self.entries = OrderedDict()
+        self.size = 0
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def set_version(self, version):
+        # Results of any other build version can no longer be returned. The
+        # disk tier is shared with other processes, which may still be on an
+        # older build, so stale versions are only pruned at startup (the
+        # first version set) and otherwise left where they are
+        if version == self.version:
+            return
+        if self.version is None and self.disk_path and op.isdir(self.disk_path):
+            for name in os.listdir(self.disk_path):
+                if name != version:
+                    shutil.rmtree(op.join(self.disk_path, name), ignore_errors=True)
+        self.version = version
+        self.entries.clear()
+        self.size = 0
+
+    def key(self, query, bindings=None):
+        # Bindings as N3, so Literal('1') and Literal(1) differ
+        parts = [str(self.version), normalize(query)]
+        parts += [f'{variable}={value.n3()}' for variable, value
+                  in sorted((str(variable), value) for variable, value in (bindings or {}).items())]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return pickle.loads(data)
+        path = self.disk_entry(key)
+        if path and op.exists(path):
+            with open(path, 'rb') as file:
+                data = file.read()
+            self.counters['disk_hits'] += 1
+            self.remember(key, data)
+            return pickle.loads(data)
+        self.counters['misses'] += 1
+        return None
+
+    def put(self, key, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self.remember(key, data)
+        path = self.disk_entry(key)
+        if path:
+            os.makedirs(op.dirname(path), exist_ok=True)
+            # Written aside and renamed, so readers never see half a file
+            with open(path + '.tmp', 'wb') as file:
+                file.write(data)
+            os.replace(path + '.tmp', path)
+
+    def remember(self, key, data):
+        # Results larger than the whole budget are only kept on disk
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.counters['evictions'] += 1
+
+    def disk_entry(self, key):
+        if not self.disk_path:
+            return None
+        return op.join(self.disk_path, str(self.version), key + '.pkl')
+
+    def stats(self):
+        return {**self.counters, 'entries': len(self.entries), 'bytes': self.size,
+                'version': self.version}
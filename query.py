@@ -0,0 +1,64 @@
+from queries.QueryRunner import QueryRunner, QUERIES
+from queries.ResultCache import ResultCache
+import argparse
+import os
+import os.path as op
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('queries', nargs='*',
+                        help=f'queries to run (default: all of {", ".join(QUERIES)})')
+    parser.add_argument('--store', action='store_true',
+                        help='query output/KG.sqlite instead of parsing the Turtle files')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per query, reusing the prepared query')
+    parser.add_argument('--cache', type=int, metavar='MB',
+                        help='cache results in memory, up to MB megabytes')
+    parser.add_argument('--cache-dir',
+                        help='also keep cached results on disk, e.g. output/query_cache')
+    parser.add_argument('--author', help='author name for papers_by_author')
+    parser.add_argument('--community',
+                        help='community for papers_by_author, top_cited_papers and papers_about')
+    parser.add_argument('--keyword', help='keyword for top_conferences')
+    parser.add_argument('--topic', help='search terms for papers_about')
+    args = parser.parse_args()
+    for name in args.queries:
+        if name not in QUERIES:
+            parser.error(f'unknown query: {name}')
+
+    BASEURL = "https://SDM.org/Lab2"
+    output_dir = op.join(os.getcwd(), 'output')
+
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = ResultCache((args.cache or 64) << 20, args.cache_dir)
+    runner = QueryRunner(BASEURL, store_path=op.join(output_dir, 'KG.sqlite')
+                         if args.store else None, cache=cache)
+    parameters = {'author_name': args.author, 'community': args.community,
+                  'keyword': args.keyword, 'topic': args.topic}
+
+    for name in args.queries or QUERIES:
+        missing = runner.missing(name)
+        if missing:
+            print(f'{name}: skipped, needs {missing}')
+            continue
+        bindings = {variable: parameters[variable] for variable in QUERIES[name][1]
+                    if parameters[variable] is not None}
+        latencies = []
+        for _ in range(args.repeat):
+            rows, latency = runner.run(name, **bindings)
+            latencies.append(latency)
+        print(f'{name}: {len(rows)} rows, first {latencies[0] * 1000:.1f} ms, '
+              f'best {min(latencies) * 1000:.1f} ms')
+        for row in rows:
+            print('   ', ' '.join(str(value) for value in row))
+
+    if cache is not None:
+        print('Result cache:', ', '.join(f'{name} {value}' for name, value in cache.stats().items()))
+    runner.close()
+    return None
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from queries.Endpoint import SPARQLEndpoint
+import argparse
+import os
+import os.path as op
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes, each with the graph loaded')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds a query may run before it is answered with 503')
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help='queries waiting for a worker before new ones get 503')
+    parser.add_argument('--store', action='store_true',
+                        help='query output/KG.sqlite instead of parsing the Turtle files')
+    parser.add_argument('--paths', nargs='+',
+                        help='RDF files to load (default: TBOX.ttl, ABOX.ttl and INFERRED.nt of output/)')
+    parser.add_argument('--cache', type=int, metavar='MB',
+                        help='cache results in memory in every worker, up to MB megabytes')
+    parser.add_argument('--cache-dir',
+                        help='also keep cached results on disk, shared by the workers')
+    args = parser.parse_args()
+
+    BASEURL = "https://SDM.org/Lab2"
+    output_dir = op.join(os.getcwd(), 'output')
+
+    options = {'baseURL': BASEURL, 'paths': args.paths,
+               'store_path': op.join(output_dir, 'KG.sqlite') if args.store else None,
+               'cache_mb': args.cache, 'cache_dir': args.cache_dir}
+    SPARQLEndpoint(options, args.workers, args.max_queue, args.timeout,
+                   args.host, args.port).start()
+    return None
+
+if __name__ == '__main__':
+    main()
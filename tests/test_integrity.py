@@ -0,0 +1,39 @@
+# SDM Project 2. Knowledge Graphs
+# Referential integrity of edges with malformed keys.
+# Run from the repository root: python -m pytest tests
+from pandas import DataFrame, array
+from generators.ABOXGenerator import ABOXGenerator
+from generators.URNIndex import URNIndex
+import json
+import os
+import os.path as op
+import shutil
+
+DATA = op.join(op.dirname(op.dirname(op.abspath(__file__))), 'data')
+
+
+def test_index_skips_na_keys():
+    index = URNIndex('paper')
+    index.add(DataFrame({'csv_id_paper': array([1, 2, None], dtype='Int64'),
+                         'paper': ['urn:1', 'urn:2', 'urn:3']}), 'csv_id_paper', 'paper')
+    assert index.unkeyed == {'paper': 1}
+    edges = DataFrame({'csv_id_paper': array([1, None, 5], dtype='Int64')})
+    resolved = index.resolve(edges, 'csv_id_paper', 'paper', 'cites')
+    assert resolved['paper'].tolist() == ['urn:1']
+    assert index.unresolved == {'cites': {'csv_id_paper': {'checked': 3, 'dangling': 2}}}
+
+
+def test_malformed_edge_keys_are_dangling(tmp_path, monkeypatch):
+    # An edge with an empty id and one with a non-numeric id are counted as
+    # dangling instead of failing the build
+    shutil.copytree(DATA, tmp_path / 'data')
+    with open(tmp_path / 'data' / 'edges' / 'Edge_paper_paper.csv', 'a') as file:
+        file.write(',"2"\n"x1","2"\n')
+    os.mkdir(tmp_path / 'output')
+    monkeypatch.chdir(tmp_path)
+    ABOXGenerator(ttl_path=str(tmp_path / 'output' / 'ABOX.nt'), format='nt', cache_path=None)
+    with open(tmp_path / 'output' / 'integrity.json') as file:
+        report = json.load(file)
+    assert report['relations']['cites'] == {
+        'subject_csv_id_paper': {'checked': 5909, 'dangling': 2},
+        'object_csv_id_paper': {'checked': 5907, 'dangling': 0}}